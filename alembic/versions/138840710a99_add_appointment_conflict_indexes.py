@@ -0,0 +1,37 @@
+"""Add partial active-appointment and unavailable-range indexes
+
+Revision ID: 138840710a99
+Revises: 96b04e9f0949
+Create Date: 2026-10-17 12:20:54.603117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '138840710a99'
+down_revision: Union[str, Sequence[str], None] = '96b04e9f0949'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'idx_appointments_location_time_active', 'appointments',
+        ['location_id', 'start_time', 'end_time'], unique=False,
+        postgresql_where=sa.text("status != 'cancelled'")
+    )
+    op.create_index(
+        'idx_unavailable_location_range', 'unavailable_periods',
+        ['location_id', 'start_datetime', 'end_datetime'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_unavailable_location_range', table_name='unavailable_periods')
+    op.drop_index('idx_appointments_location_time_active', table_name='appointments')
@@ -0,0 +1,64 @@
+"""Exclude overlapping live appointments per location
+
+Revision ID: 4f2c9a1d7e63
+Revises: 138840710a99
+Create Date: 2026-10-17 13:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2c9a1d7e63'
+down_revision: Union[str, Sequence[str], None] = '138840710a99'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Only appointments that still occupy the chair take part; completed, no_show,
+# rescheduled and cancelled rows may overlap freely
+LIVE_STATUSES = "('scheduled', 'confirmed', 'checked_in', 'in_progress')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Pre-flight: ADD CONSTRAINT would abort on existing overlaps with an opaque error,
+    # so list them and explain how to resolve them instead
+    overlaps = op.get_bind().execute(sa.text(f"""
+        SELECT a.id, b.id, a.location_id, a.start_time, a.end_time, b.start_time, b.end_time
+        FROM appointments a
+        JOIN appointments b
+          ON a.location_id = b.location_id
+         AND a.id < b.id
+         AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time)
+        WHERE a.status IN {LIVE_STATUSES}
+          AND b.status IN {LIVE_STATUSES}
+        ORDER BY a.start_time
+        LIMIT 50
+    """)).fetchall()
+    if overlaps:
+        pairs = "\n".join(
+            f"  location {loc}: appointment {a_id} ({a_start} - {a_end}) overlaps appointment {b_id} ({b_start} - {b_end})"
+            for a_id, b_id, loc, a_start, a_end, b_start, b_end in overlaps
+        )
+        raise RuntimeError(
+            "Cannot add excl_appointments_location_time: live appointments overlap "
+            f"(showing up to 50 pairs):\n{pairs}\n"
+            "Cancel, reschedule or complete one appointment of each pair, then re-run the upgrade."
+        )
+
+    # btree_gist provides the "=" operator class for location_id inside a GiST index
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(f"""
+        ALTER TABLE appointments
+        ADD CONSTRAINT excl_appointments_location_time
+        EXCLUDE USING gist (location_id WITH =, tstzrange(start_time, end_time) WITH &&)
+        WHERE (status IN {LIVE_STATUSES})
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE appointments DROP CONSTRAINT IF EXISTS excl_appointments_location_time")
@@ -0,0 +1,28 @@
+"""Add audit log keyset pagination index
+
+Revision ID: 51e83b825da3
+Revises: 5166eadd800b
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '51e83b825da3'
+down_revision: Union[str, Sequence[str], None] = '5166eadd800b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_audit_timestamp_id', 'audit_logs', ['timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_audit_timestamp_id', table_name='audit_logs')
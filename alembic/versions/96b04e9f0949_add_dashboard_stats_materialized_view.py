@@ -0,0 +1,47 @@
+"""Add mv_dashboard_stats materialized view
+
+Revision ID: 96b04e9f0949
+Revises: efe752bd506a
+Create Date: 2026-10-17 11:41:09.127733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '96b04e9f0949'
+down_revision: Union[str, Sequence[str], None] = 'efe752bd506a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # One row per location plus a grand-total row (bucket 0) from ROLLUP.
+    # Refreshed periodically by the application (see crud.refresh_dashboard_stats_view).
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_dashboard_stats AS
+        SELECT
+            COALESCE(a.location_id, 0) AS bucket,
+            (SELECT count(*) FROM patients) AS total_patients,
+            count(a.id) AS total_appointments,
+            count(a.id) FILTER (
+                WHERE a.start_time >= date_trunc('day', now())
+                  AND a.start_time < date_trunc('day', now()) + interval '1 day'
+            ) AS appointments_today,
+            count(a.id) FILTER (WHERE a.status IN ('scheduled', 'confirmed')) AS pending_appointments,
+            count(a.id) FILTER (WHERE a.start_time >= now() - interval '7 days') AS appointments_week,
+            now() AS refreshed_at
+        FROM appointments a
+        GROUP BY ROLLUP (a.location_id)
+    """)
+    # Required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.create_index('idx_mv_dashboard_stats_bucket', 'mv_dashboard_stats', ['bucket'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_dashboard_stats")
@@ -0,0 +1,47 @@
+"""Add patient_name_tokens for word-level patient name search
+
+Revision ID: a7d3e5b91c08
+Revises: 4f2c9a1d7e63
+Create Date: 2026-10-17 13:31:47.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e5b91c08'
+down_revision: Union[str, Sequence[str], None] = '4f2c9a1d7e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tokens = op.create_table(
+        'patient_name_tokens',
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('patient_id', 'token_hash')
+    )
+    op.create_index(op.f('ix_patient_name_tokens_token_hash'), 'patient_name_tokens', ['token_hash'], unique=False)
+
+    # Backfill from the encrypted names; only the application holds the key
+    from app.security import encryption_service
+    bind = op.get_bind()
+    rows = []
+    for patient_id, name_encrypted in bind.execute(sa.text("SELECT id, name_encrypted FROM patients")):
+        full_name = encryption_service.decrypt(name_encrypted) if name_encrypted else ""
+        for token_hash in {encryption_service.hash_for_lookup(token) for token in full_name.split()}:
+            rows.append({'patient_id': patient_id, 'token_hash': token_hash})
+    if rows:
+        op.bulk_insert(tokens, rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_patient_name_tokens_token_hash'), table_name='patient_name_tokens')
+    op.drop_table('patient_name_tokens')
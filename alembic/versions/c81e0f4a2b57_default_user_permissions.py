@@ -0,0 +1,39 @@
+"""Default users.permissions to an empty object
+
+Revision ID: c81e0f4a2b57
+Revises: a7d3e5b91c08
+Create Date: 2026-10-17 14:02:33.170482
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81e0f4a2b57'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e5b91c08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("UPDATE users SET permissions = '{}' WHERE permissions IS NULL")
+    op.alter_column(
+        'users', 'permissions',
+        existing_type=sa.JSON(),
+        nullable=False,
+        server_default=sa.text("'{}'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'users', 'permissions',
+        existing_type=sa.JSON(),
+        nullable=True,
+        server_default=None
+    )
@@ -0,0 +1,48 @@
+"""Backfill and enforce defaults for user status columns
+
+Revision ID: d5e8b2f7a419
+Revises: c81e0f4a2b57
+Create Date: 2026-10-17 16:21:08.553910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e8b2f7a419'
+down_revision: Union[str, Sequence[str], None] = 'c81e0f4a2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = (
+    ('mfa_enabled', sa.Boolean(), 'false'),
+    ('is_active', sa.Boolean(), 'true'),
+    ('failed_login_attempts', sa.Integer(), '0'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, type_, default in _COLUMNS:
+        op.execute(f"UPDATE users SET {name} = {default} WHERE {name} IS NULL")
+    for name, type_, default in _COLUMNS:
+        op.alter_column(
+            'users', name,
+            existing_type=type_,
+            nullable=False,
+            server_default=sa.text(default)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, type_, default in _COLUMNS:
+        op.alter_column(
+            'users', name,
+            existing_type=type_,
+            nullable=True,
+            server_default=None
+        )
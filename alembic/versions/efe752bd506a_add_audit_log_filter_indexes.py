@@ -0,0 +1,30 @@
+"""Add audit log category/severity + timestamp indexes
+
+Revision ID: efe752bd506a
+Revises: 51e83b825da3
+Create Date: 2026-10-17 11:03:27.540918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'efe752bd506a'
+down_revision: Union[str, Sequence[str], None] = '51e83b825da3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_audit_category_date', 'audit_logs', ['category', 'timestamp'], unique=False)
+    op.create_index('idx_audit_severity_date', 'audit_logs', ['severity', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_audit_severity_date', table_name='audit_logs')
+    op.drop_index('idx_audit_category_date', table_name='audit_logs')
@@ -1,12 +1,19 @@
+import asyncio
 import json
 from datetime import datetime, timezone
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable, List
 import logging
+from sqlalchemy import insert
 from sqlalchemy.exc import SQLAlchemyError
 from app.database import SessionLocal
 from app import models
 
 
+# Background writer batching limits
+AUDIT_BATCH_SIZE = 500
+AUDIT_BATCH_WINDOW_SECONDS = 1.0
+
+
 class ComplianceLogger:
 	"""Unified compliance logger that stores all compliance events directly in the AuditLog database table."""
 
@@ -18,8 +25,13 @@ class ComplianceLogger:
 		self.logger = logging.getLogger('NullComplianceLogger')
 		self.logger.addHandler(logging.NullHandler())
 		self.logger.setLevel(logging.INFO)
+		# Background writer state; events are written inline until start() is awaited
+		self._queue: Optional[asyncio.Queue] = None
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._writer_task: Optional[asyncio.Task] = None
+		self._stopping = False
 
-	def log_event(
+	def build_record(
 		self,
 		user_id: Optional[int],
 		role: Optional[str],
@@ -32,8 +44,8 @@ class ComplianceLogger:
 		username: Optional[str] = None,
 		user_agent: Optional[str] = None,
 		**_: Any
-	) -> None:
-		"""Logs an event into the AuditLog table directly via SQLAlchemy.
+	) -> Optional[Dict[str, Any]]:
+		"""Normalizes an event into AuditLog column values, or returns None if it should not be stored.
 		Accepts and ignores extra kwargs for backward compatibility.
 		"""
 		# Normalize action to match DB Enum values (DB enum may not include new extended actions)
@@ -70,38 +82,142 @@ class ComplianceLogger:
 
 		# --- FIX: Add check to stop READ logs ---
 		if action_db == 'READ':
-			return  # Do not log READ actions
+			return None  # Do not log READ actions
 
-		db = SessionLocal()
+		# Coerce action to Enum if possible
 		try:
-			# Coerce action to Enum if possible
+			action_enum = models.AuditAction[action_db] if isinstance(action_db, str) else action_db
+		except Exception:
 			try:
-				action_enum = models.AuditAction[action_db] if isinstance(action_db, str) else action_db
+				action_enum = models.AuditAction(action_db)  # allow direct value lookup
 			except Exception:
+				action_enum = models.AuditAction.READ # Fallback, though we should return above
+
+		return {
+			'user_id': user_id,
+			'username': username if username else (str(user_id) if user_id else 'System'),
+			'action': action_enum,
+			'category': category or 'GENERAL',
+			'severity': severity or 'INFO',
+			'resource_type': resource_type,
+			'resource_id': resource_id,
+			'details': details,
+			'ip_address': '127.0.0.1',  # placeholder until request context injection
+			'user_agent': user_agent,
+			'timestamp': datetime.now(timezone.utc),
+		}
+
+	def log_event(self, user_id: Optional[int], role: Optional[str], action: str, category: str, **kwargs: Any) -> None:
+		"""Logs an event into the AuditLog table.
+		Queued for the background writer when it is running, otherwise written directly via SQLAlchemy.
+		"""
+		record = self.build_record(user_id, role, action, category, **kwargs)
+		if record:
+			self._enqueue_or_insert(record)
+
+	def log_events(self, events: Iterable[Dict[str, Any]]) -> None:
+		"""Logs many events (each a dict of log_event kwargs) with one multi-row INSERT and one commit."""
+		records = [record for record in (self.build_record(**event) for event in events) if record]
+		if records:
+			self._insert_records(records)
+
+	async def start(self) -> None:
+		"""Starts the background writer on the running event loop."""
+		if self._writer_task is not None:
+			return
+		self._loop = asyncio.get_running_loop()
+		self._queue = asyncio.Queue()
+		self._stopping = False
+		self._writer_task = asyncio.create_task(self._write_batches())
+
+	async def stop(self) -> None:
+		"""Stops the background writer; every record accepted before or during shutdown is written."""
+		if self._writer_task is None:
+			return
+		# From here on new events bypass the queue and are inserted synchronously
+		self._stopping = True
+		# The sentinel makes the writer flush its current batch and exit; cancelling it
+		# could drop records it has already taken off the queue
+		self._queue.put_nowait(None)
+		await self._writer_task
+		# Records handed over from worker threads just before _stopping was set
+		remaining = []
+		while not self._queue.empty():
+			record = self._queue.get_nowait()
+			if record is not None:
+				remaining.append(record)
+		self._writer_task = None
+		self._queue = None
+		self._loop = None
+		if remaining:
+			await asyncio.to_thread(self._insert_records, remaining)
+
+	def _enqueue_or_insert(self, record: Dict[str, Any]) -> None:
+		if self._stopping or self._queue is None or self._loop is None or self._loop.is_closed():
+			self._insert_records([record])
+			return
+		try:
+			in_loop_thread = asyncio.get_running_loop() is self._loop
+		except RuntimeError:
+			in_loop_thread = False  # Sync endpoints run in a worker thread
+		if in_loop_thread:
+			self._queue.put_nowait(record)
+		else:
+			self._loop.call_soon_threadsafe(self._accept_from_thread, record)
+
+	def _accept_from_thread(self, record: Dict[str, Any]) -> None:
+		"""Runs on the loop for records posted by worker threads; queues them unless the writer is gone."""
+		if self._queue is not None and not self._stopping:
+			self._queue.put_nowait(record)
+		else:
+			self._insert_records([record])
+
+	async def _write_batches(self) -> None:
+		"""Drains the queue in batches of up to AUDIT_BATCH_SIZE or AUDIT_BATCH_WINDOW_SECONDS.
+		A None on the queue is the stop sentinel: the current batch is flushed and the writer exits.
+		"""
+		while True:
+			record = await self._queue.get()
+			if record is None:
+				return
+			batch = [record]
+			stop_requested = False
+			deadline = self._loop.time() + AUDIT_BATCH_WINDOW_SECONDS
+			while len(batch) < AUDIT_BATCH_SIZE:
+				timeout = deadline - self._loop.time()
+				if timeout <= 0:
+					break
 				try:
-					action_enum = models.AuditAction(action_db)  # allow direct value lookup
-				except Exception:
-					action_enum = models.AuditAction.READ # Fallback, though we should return above
-
-			db_log = models.AuditLog(
-				user_id=user_id,
-				username=username if username else (str(user_id) if user_id else 'System'),
-				action=action_enum,
-				category=category or 'GENERAL',
-				severity=severity or 'INFO',
-				resource_type=resource_type,
-				resource_id=resource_id,
-				details=details,
-				ip_address='127.0.0.1',  # placeholder until request context injection
-				user_agent=user_agent,
-				timestamp=datetime.now(timezone.utc),
-			)
-			db.add(db_log)
+					record = await asyncio.wait_for(self._queue.get(), timeout)
+				except asyncio.TimeoutError:
+					break
+				if record is None:
+					stop_requested = True
+					break
+				batch.append(record)
+			await asyncio.to_thread(self._insert_records, batch)
+			if stop_requested:
+				return
+
+	def _insert_records(self, records: List[Dict[str, Any]]) -> None:
+		"""Inserts records in one executemany; if that fails, retries them one by one so a bad row only loses itself."""
+		db = SessionLocal()
+		try:
+			db.execute(insert(models.AuditLog), records)
 			db.commit()
-			db.refresh(db_log)
 		except SQLAlchemyError as e:
 			db.rollback()
-			self.logger.error(f"Failed to save compliance log to DB: {e}")
+			if len(records) == 1:
+				self.logger.error(f"Failed to save compliance log to DB: {e}; dropped record: {records[0]}")
+				return
+			self.logger.warning(f"Batch of {len(records)} compliance logs failed, retrying row by row: {e}")
+			for record in records:
+				try:
+					db.execute(insert(models.AuditLog), [record])
+					db.commit()
+				except SQLAlchemyError as row_error:
+					db.rollback()
+					self.logger.error(f"Failed to save compliance log to DB: {row_error}; dropped record: {record}")
 		finally:
 			db.close()
 
@@ -31,6 +31,7 @@ class Settings(BaseSettings):
     database_url: str = Field(..., alias="DATABASE_URL")
     database_pool_size: int = Field(default=20, alias="DATABASE_POOL_SIZE")
     database_max_overflow: int = Field(default=30, alias="DATABASE_MAX_OVERFLOW")
+    database_pool_recycle: int = Field(default=1800, alias="DATABASE_POOL_RECYCLE")  # Seconds
     
     # Security
     secret_key: str = Field(..., alias="SECRET_KEY")
@@ -1,22 +1,26 @@
 # app/crud.py - FULLY RESTORED AND CORRECTED
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, and_, desc, func
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only, raiseload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import or_, and_, desc, func, select, bindparam, update, insert, delete, text, tuple_, lambda_stmt, literal_column, literal, exists, union_all, case, column, Integer, String
+from sqlalchemy import values as values_clause  # aliased: 'values' is a common local name here
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from datetime import datetime, timedelta, date, time, timezone # <-- Import timezone
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterator, NamedTuple
 import secrets
+import hashlib
 import logging
 import os
 import json
 import re
-import os
-import json
-import re
 import asyncio
+from contextlib import contextmanager
 from . import models, schemas
-from .security import get_password_hash, verify_password, encryption_service, SecurityConfig
+from .security import get_password_hash, verify_password, encryption_service, SecurityConfig, redis_client
 from fastapi import HTTPException, status
 from app.compliance_logger import compliance_logger
+from app.core.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG) # Force DEBUG level for this logger
@@ -26,17 +30,179 @@ logger.setLevel(logging.DEBUG) # Force DEBUG level for this logger
 class CRUDError(Exception):
     pass
 
+class AppointmentConflictError(CRUDError):
+    """Raised when the no-overlap constraint rejects an appointment; routers answer 409."""
+    pass
+
+@contextmanager
+def _keep_loaded_on_commit(db: Session):
+    """Skip expiring a just-created row on commit; eager_defaults already fetched its server defaults."""
+    previous = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        yield
+    finally:
+        db.expire_on_commit = previous
+
+# System configuration changes rarely; cached values are dropped by set_system_config
+_system_config_cache = TTLCache(maxsize=128, ttl=300)
+_CONFIG_MISSING = object()
+
+# Working hours per (location_id, day_of_week); None means closed. Dropped on schedule writes.
+_schedule_cache = TTLCache(maxsize=64, ttl=60)
+_SCHEDULE_MISSING = object()
+
+class _ScheduleHours(NamedTuple):
+    start_time: time
+    end_time: time
+    break_start: Optional[time]
+    break_end: Optional[time]
+
+# --- Prebuilt statements for hot primary-key lookups ---
+# Built once at import so each call only binds parameters; SQLAlchemy's compiled
+# cache (sized via query_cache_size on the engine) then reuses the compiled SQL.
+_STMT_PATIENT_BY_ID = select(models.Patient).where(models.Patient.id == bindparam("patient_id"))
+_STMT_LOCATION_BY_ID = select(models.Location).where(models.Location.id == bindparam("location_id"))
+_STMT_PATIENT_BY_PHONE_HASH = select(models.Patient).where(models.Patient.phone_hash == bindparam("phone_hash")).limit(1)
+_STMT_PATIENT_BY_EMAIL_HASH = select(models.Patient).where(models.Patient.email_hash == bindparam("email_hash")).limit(1)
+_STMT_ACTIVE_WHATSAPP_SESSION = select(models.WhatsAppSession).where(
+    models.WhatsAppSession.phone_number == bindparam("phone_number"),
+    models.WhatsAppSession.is_active == True
+).limit(1)
+_STMT_USER_BY_USERNAME = select(models.User).where(models.User.username == bindparam("username")).limit(1)
+_STMT_USER_BY_IDENTIFIER = select(models.User).where(
+    or_(models.User.username == bindparam("identifier"), models.User.email == bindparam("identifier"))
+).limit(1)
+_STMT_SYSTEM_CONFIG_BY_KEY = select(models.SystemConfiguration).where(models.SystemConfiguration.key == bindparam("key"))
+
+# Free 15-minute slots for one location/day, computed entirely in Postgres: the slot grid
+# [:slot_start, :slot_end) is expanded with generate_series and every slot that overlaps a
+# live appointment or an unavailable period is dropped, so only the final slot times come back.
+# The grid is naive local time (no session TimeZone shift on the way out), and blocking is a
+# range-overlap test, so ranges that don't start on the grid still block every slot they touch,
+# matching _day_interval_mask on the non-Postgres path.
+_SQL_FREE_SLOTS_PG = text("""
+    WITH slots AS (
+        SELECT gs AS slot_start
+        FROM generate_series(
+            CAST(:slot_start AS timestamp),
+            CAST(:slot_end AS timestamp) - interval '15 minutes',
+            interval '15 minutes'
+        ) AS gs
+    ),
+    blocked AS (
+        SELECT a.start_time AS range_start, a.end_time AS range_end
+        FROM appointments a
+        WHERE a.location_id = :location_id
+          AND a.status <> 'cancelled'
+          AND a.start_time >= :day_start
+          AND a.end_time <= :day_end
+        UNION ALL
+        SELECT u.start_datetime, u.end_datetime
+        FROM unavailable_periods u
+        WHERE u.location_id = :location_id
+          AND u.start_datetime <= :day_end
+          AND u.end_datetime >= :day_start
+    )
+    SELECT CAST(s.slot_start AS time) AS slot_time
+    FROM slots s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM blocked b
+        WHERE b.range_start < s.slot_start + interval '15 minutes'
+          AND b.range_end > s.slot_start
+    )
+    ORDER BY s.slot_start
+""")
+
+# --- Slot bitmasks: one bit per 15-minute slot of the day (bit 0 = 00:00) ---
+_SLOT_MINUTES = 15
+_SLOTS_PER_DAY = 24 * 60 // _SLOT_MINUTES
+
+def _interval_mask(start_slot: int, end_slot: int) -> int:
+    """Bits set for slots start_slot <= i < end_slot."""
+    if end_slot <= start_slot:
+        return 0
+    return ((1 << end_slot) - 1) & ~((1 << start_slot) - 1)
+
+def _day_interval_mask(for_date: date, start: datetime, end: datetime) -> int:
+    """Mask of every slot on for_date that [start, end) overlaps, clamped to the day."""
+    if start.date() > for_date or end.date() < for_date:
+        return 0
+    start_minute = 0 if start.date() < for_date else start.hour * 60 + start.minute
+    if end.date() > for_date:
+        end_minute = 24 * 60
+    else:
+        end_minute = end.hour * 60 + end.minute + (1 if end.second or end.microsecond else 0)
+    return _interval_mask(start_minute // _SLOT_MINUTES, -(-end_minute // _SLOT_MINUTES))
+
+def _slot_bit(slot: time) -> int:
+    return (slot.hour * 60 + slot.minute) // _SLOT_MINUTES
+
+def _schedule_slot_range(schedule: _ScheduleHours) -> Tuple[int, int]:
+    """[first_slot, end_slot): the grid slots that fit entirely inside working hours."""
+    first_slot = -(-(schedule.start_time.hour * 60 + schedule.start_time.minute) // _SLOT_MINUTES)
+    end_slot = (schedule.end_time.hour * 60 + schedule.end_time.minute) // _SLOT_MINUTES
+    return first_slot, end_slot
+
+def _seconds_of_day(t: time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+# Slot reason by a 4-bit code (break=8, booked=4, unavailable=2, gcal_busy=1); the highest
+# set bit wins, so the table encodes the precedence break > booked > unavailable > gcal_busy.
+_SLOT_REASON_BY_CODE = tuple(
+    "break" if code & 8 else "booked" if code & 4 else "unavailable" if code & 2 else "gcal_busy" if code & 1 else "available"
+    for code in range(16)
+)
+
+def _schedule_hours_stmt(location_id: int, day_of_week: int):
+    return select(
+        models.LocationSchedule.start_time,
+        models.LocationSchedule.end_time,
+        models.LocationSchedule.break_start,
+        models.LocationSchedule.break_end
+    ).where(
+        models.LocationSchedule.location_id == location_id,
+        models.LocationSchedule.day_of_week == day_of_week,
+        models.LocationSchedule.is_available == True
+    ).limit(1)
+
+def _get_schedule_hours(db: Session, location_id: int, day_of_week: int) -> Optional[_ScheduleHours]:
+    """Working hours for a location/weekday through _schedule_cache; None when closed."""
+    schedule = _schedule_cache.get((location_id, day_of_week), _SCHEDULE_MISSING)
+    if schedule is _SCHEDULE_MISSING:
+        row = db.execute(_schedule_hours_stmt(location_id, day_of_week)).first()
+        schedule = _ScheduleHours(*row) if row else None
+        _schedule_cache.set((location_id, day_of_week), schedule)
+    return schedule
+
+def _blocked_ranges_stmt(location_id: int, start_of_day: datetime, end_of_day: datetime):
+    """Live appointments and unavailable periods for one location/day as (start, end, kind) rows in one query."""
+    return union_all(
+        select(
+            models.Appointment.start_time.label("start"),
+            models.Appointment.end_time.label("end"),
+            literal("booked").label("kind")
+        ).where(
+            models.Appointment.location_id == location_id,
+            models.Appointment.start_time >= start_of_day,
+            models.Appointment.end_time <= end_of_day,
+            models.Appointment.status != models.AppointmentStatus.cancelled
+        ),
+        select(
+            models.UnavailablePeriod.start_datetime,
+            models.UnavailablePeriod.end_datetime,
+            literal("unavailable")
+        ).where(
+            models.UnavailablePeriod.location_id == location_id,
+            models.UnavailablePeriod.start_datetime <= end_of_day,
+            models.UnavailablePeriod.end_datetime >= start_of_day
+        )
+    )
+
 # --- NEW UTILITY FUNCTION ---
 def _ensure_complete_user(user: models.User) -> models.User:
-    """Ensures the user object has non-None values for required boolean/integer fields and grants default permissions if missing."""
+    """Grants default permissions if missing and marks the SuperAdmin (status flags are NOT NULL with server defaults)."""
     if user:
-        if getattr(user, 'mfa_enabled', None) is None:
-            user.mfa_enabled = False
-        if getattr(user, 'is_active', None) is None:
-            user.is_active = True
-        if getattr(user, 'failed_login_attempts', None) is None:
-            user.failed_login_attempts = 0
-        
         # FIX: Grant default permissions if the permissions column is NULL or empty ({}) 
         # (This is needed for existing users before the schema was updated)
         if not user.permissions or (isinstance(user.permissions, dict) and not user.permissions):
@@ -51,10 +217,17 @@ def _ensure_complete_user(user: models.User) -> models.User:
 
 # ==================== USER CRUD OPERATIONS (UPGRADED) ====================
 
+# Users are looked up several times per request (auth, permission checks, audit logging).
+# get_user goes through the session identity map, and identifier lookups remember the
+# resolved id in db.info, so repeats within one request-scoped session skip the SELECT.
+_USER_ID_BY_IDENTIFIER = "user_id_by_identifier"
+
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
     """Get user by ID with error handling."""
     try:
-        user = db.query(models.User).filter(models.User.id == user_id, models.User.deleted_at.is_(None)).first()
+        user = db.get(models.User, user_id)
+        if user is not None and user.deleted_at is not None:
+            return None  # The identity map bypasses the soft-delete filter
         return _ensure_complete_user(user)
     except SQLAlchemyError as e:
         logger.error(f"Error fetching user {user_id}: {str(e)}")
@@ -63,10 +236,12 @@ def get_user(db: Session, user_id: int) -> Optional[models.User]:
 def get_user_by_identifier(db: Session, identifier: str) -> Optional[models.User]:
     """Get user by username OR email."""
     try:
-        user = db.query(models.User).filter(
-            or_(models.User.username == identifier, models.User.email == identifier),
-            models.User.deleted_at.is_(None)
-        ).first()
+        known_ids = db.info.setdefault(_USER_ID_BY_IDENTIFIER, {})
+        if identifier in known_ids:
+            return get_user(db, known_ids[identifier])
+        user = db.execute(_STMT_USER_BY_IDENTIFIER, {"identifier": identifier}).scalars().first()
+        if user is not None:
+            known_ids[identifier] = user.id
         return _ensure_complete_user(user)
     except SQLAlchemyError as e:
         logger.error(f"Error fetching user by identifier '{identifier}': {str(e)}")
@@ -74,10 +249,7 @@ def get_user_by_identifier(db: Session, identifier: str) -> Optional[models.User
 
 def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
     try:
-        user = db.query(models.User).filter(
-            models.User.username == username,
-            models.User.deleted_at.is_(None)
-        ).first()
+        user = db.execute(_STMT_USER_BY_USERNAME, {"username": username}).scalars().first()
         return _ensure_complete_user(user)
     except SQLAlchemyError as e:
         logger.error(f"Error fetching user by username '{username}': {str(e)}")
@@ -86,20 +258,35 @@ def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
 def get_users(db: Session, skip: int = 0, limit: int = 100, role: str = None, is_active: bool = None) -> List[models.User]:
     """Get users with optional filters."""
     try:
-        query = db.query(models.User).filter(models.User.deleted_at.is_(None))
+        filters = []
         if role:
-            query = query.filter(models.User.role == role)
+            filters.append(models.User.role == role)
         if is_active is not None:
-            query = query.filter(models.User.is_active == is_active)
-        users = query.order_by(models.User.username).offset(skip).limit(limit).all()
-        # Fix for permissions being None which causes a validation error
-        for user in users:
-            user.permissions = user.permissions or {}
+            filters.append(models.User.is_active == is_active)
+        # The list view only serializes columns; raiseload turns any future relationship
+        # access here into an immediate error instead of a silent per-row SELECT
+        users = db.query(models.User).options(raiseload("*")).filter(*filters).order_by(models.User.username).offset(skip).limit(limit).all()
         return [_ensure_complete_user(u) for u in users]
     except SQLAlchemyError as e:
         logger.error(f"Error fetching users: {str(e)}")
         raise CRUDError(f"Database error: {str(e)}")
 
+def _user_conflict_message(error: IntegrityError) -> str:
+    """Map a users unique-constraint violation to the message the pre-check SELECTs used to give."""
+    diag = getattr(getattr(error, "orig", None), "diag", None)
+    constraint = (getattr(diag, "constraint_name", None) or str(error.orig)).lower()
+    if "username" in constraint:
+        return "Username already exists"
+    if "email" in constraint:
+        return "Email already exists"
+    return "User creation failed due to data constraints"
+
+def _is_appointment_overlap(error: IntegrityError) -> bool:
+    """True when the error comes from the no-overlap exclusion constraint on appointments."""
+    diag = getattr(getattr(error, "orig", None), "diag", None)
+    constraint = getattr(diag, "constraint_name", None) or str(error.orig)
+    return "excl_appointments_location_time" in constraint
+
 def create_user(db: Session, user: schemas.UserCreate, created_by: int = None) -> models.User:
     """Create new user with comprehensive validation."""
     
@@ -130,11 +317,8 @@ def create_user(db: Session, user: schemas.UserCreate, created_by: int = None) -
     }
     
     try:
-        if db.query(models.User).filter(models.User.username == user.username).first():
-            raise CRUDError("Username already exists")
-        if db.query(models.User).filter(models.User.email == user.email).first():
-            raise CRUDError("Email already exists")
-        
+        # No pre-check SELECTs: the unique indexes on username/email (which also cover
+        # soft-deleted accounts) reject duplicates and the IntegrityError is mapped below.
         # Determine permissions to apply
         permissions_to_set = user.permissions.model_dump() if user.permissions else default_permissions.get(user.role, default_permissions[models.UserRole.staff])
         
@@ -152,25 +336,24 @@ def create_user(db: Session, user: schemas.UserCreate, created_by: int = None) -
             password_last_changed=datetime.utcnow(),
             permissions=permissions_to_set
         )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        with _keep_loaded_on_commit(db):
+            db.add(db_user)
+            db.commit()
         logger.info(f"Created new user: {user.username} (ID: {db_user.id})")
         return _ensure_complete_user(db_user)
-    except IntegrityError:
+    except IntegrityError as e:
         db.rollback()
-        raise CRUDError("User creation failed due to data constraints")
+        raise CRUDError(_user_conflict_message(e))
     except SQLAlchemyError as e:
         db.rollback()
         raise CRUDError(f"Database error: {str(e)}")
 
 def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate) -> Optional[models.User]:
-    db_user = get_user(db, user_id=user_id)
-    if not db_user:
-        return None
-    
     # SuperAdmin Protection: Prevent modification of SuperAdmin (user.id == 1)
-    if db_user.id == 1:
+    if user_id == 1:
+        db_user = get_user(db, user_id=user_id)
+        if not db_user:
+            return None
         # Allow password update only for the user themselves, or if forced via separate endpoint.
         # For CRUD updates, we'll block role and permission changes.
         if user_update.role is not None and user_update.role != db_user.role:
@@ -184,50 +367,75 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate) -> O
         del update_data["password"]
         # Clear password_last_changed field so it gets updated on commit
         update_data["password_last_changed"] = datetime.utcnow()
-        
-    for key, value in update_data.items():
-        # Skip role and permission updates if this is the SuperAdmin, as we already checked/raised above
-        if db_user.id == 1 and key in ['role', 'permissions']: 
-            continue
-            
-        setattr(db_user, key, value)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
 
-def delete_user(db: Session, user_id: int) -> bool:
-    db_user = get_user(db, user_id=user_id)
+    # Skip role and permission updates if this is the SuperAdmin, as we already checked/raised above
+    if user_id == 1:
+        update_data.pop('role', None)
+        update_data.pop('permissions', None)
+    if not update_data:
+        return get_user(db, user_id=user_id)
+
+    # Single UPDATE ... RETURNING instead of fetch, setattr, commit, refresh
+    db_user = db.execute(
+        update(models.User)
+        .where(models.User.id == user_id, models.User.deleted_at.is_(None))
+        .values(**update_data)
+        .returning(models.User),
+        execution_options={"populate_existing": True}
+    ).scalar_one_or_none()
     if not db_user:
-        return False
+        db.rollback()
+        return None
+    with _keep_loaded_on_commit(db):
+        db.commit()
+    db.info.pop(_USER_ID_BY_IDENTIFIER, None)  # Username/email may have changed
+    return db_user
 
+def delete_user(db: Session, user_id: int) -> bool:
     # SuperAdmin Protection: Prevent deletion of SuperAdmin (user.id == 1)
-    if db_user.id == 1:
+    if user_id == 1:
         raise CRUDError("Cannot delete the primary SuperAdmin account (ID 1).")
 
-    # Soft delete by default
-    setattr(db_user, 'deleted_at', datetime.utcnow())
-    setattr(db_user, 'is_active', False)
+    # Soft delete by default, as one UPDATE without loading the row first.
+    # The default session synchronization keeps an already-loaded User in step.
+    deleted = db.execute(
+        update(models.User)
+        .where(models.User.id == user_id, models.User.deleted_at.is_(None))
+        .values(deleted_at=datetime.utcnow(), is_active=False)
+    ).rowcount
+    if not deleted:
+        db.rollback()
+        return False
     db.commit()
+    db.info.pop(_USER_ID_BY_IDENTIFIER, None)
     return True
 
 def get_patient(db: Session, patient_id: int) -> Optional[models.Patient]:
     """Get a single patient by ID."""
-    return db.query(models.Patient).filter(models.Patient.id == patient_id).first()
+    return db.execute(_STMT_PATIENT_BY_ID, {"patient_id": patient_id}).scalar_one_or_none()
 
 # ==================== PATIENT CRUD OPERATIONS (NEW) ====================
 
 
+def _patient_name_token_hashes(full_name: str) -> set:
+    """One lookup hash per distinct word of the name, so searches can match any part of it."""
+    return {encryption_service.hash_for_lookup(token) for token in full_name.split()}
+
 def create_patient(db: Session, patient: schemas.PatientCreate, created_by: int) -> models.Patient:
     # Combine first and last name into a single stored name
     full_name = patient.first_name.strip()
     if getattr(patient, "last_name", None):
         full_name = (full_name + " " + patient.last_name.strip()).strip()
 
+    name_encrypted, phone_number_encrypted, email_encrypted = encryption_service.encrypt_many(
+        [full_name, patient.phone_number or None, patient.email or None]
+    )
     db_patient = models.Patient(
-        name_encrypted=encryption_service.encrypt(full_name),
-        phone_number_encrypted=encryption_service.encrypt(patient.phone_number) if patient.phone_number else None,
-        email_encrypted=encryption_service.encrypt(patient.email) if patient.email else None,
+        name_encrypted=name_encrypted,
+        phone_number_encrypted=phone_number_encrypted,
+        email_encrypted=email_encrypted,
         name_hash=encryption_service.hash_for_lookup(full_name),
+        name_tokens=[models.PatientNameToken(token_hash=h) for h in _patient_name_token_hashes(full_name)],
         phone_hash=encryption_service.hash_for_lookup(patient.phone_number) if patient.phone_number else None,
         email_hash=encryption_service.hash_for_lookup(patient.email) if patient.email else None,
         date_of_birth=patient.date_of_birth,
@@ -235,66 +443,111 @@ def create_patient(db: Session, patient: schemas.PatientCreate, created_by: int)
         city=patient.city,
         created_by=created_by
     )
-    db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
+    with _keep_loaded_on_commit(db):
+        db.add(db_patient)
+        db.commit()
     return db_patient
 
 def get_patients(db: Session, skip: int = 0, limit: int = 100, search: str = None) -> List[models.Patient]:
     """Get patients with optional search"""
     query = db.query(models.Patient)
     if search:
-        # Search by name hash contains – compute on provided search string
+        # Hashes have no meaningful substrings: match the full name or any single word of it
         search_hash = encryption_service.hash_for_lookup(search)
-        query = query.filter(models.Patient.name_hash.ilike(f"%{search_hash}%"))
+        query = query.filter(or_(
+            models.Patient.name_hash == search_hash,
+            exists().where(
+                models.PatientNameToken.patient_id == models.Patient.id,
+                models.PatientNameToken.token_hash == search_hash
+            )
+        ))
     return query.offset(skip).limit(limit).all()
 
 def update_patient(db: Session, patient_id: int, patient_update: schemas.PatientUpdate) -> Optional[models.Patient]:
-    db_patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
-    if not db_patient:
-        return None
-
     update_data = patient_update.dict(exclude_unset=True)
+    values: Dict[str, Any] = {}
+
+    full_name = None
+    if 'first_name' in update_data:
+        # Combine with existing last name if present in update
+        last = update_data.get('last_name')
+        full_name = update_data['first_name'] if not last else f"{update_data['first_name']} {last}"
+    elif 'last_name' in update_data:
+        # Combine with existing first name from decrypted stored name
+        name_encrypted = db.execute(
+            select(models.Patient.name_encrypted).where(models.Patient.id == patient_id)
+        ).scalar_one_or_none()
+        if name_encrypted is None:
+            return None
+        parts = encryption_service.decrypt(name_encrypted).split(" ", 1)
+        first = parts[0] if parts else ""
+        full_name = f"{first} {update_data['last_name']}".strip()
+    # Each sensitive field is hashed once here and all of them are encrypted in one encrypt_many call
+    to_encrypt: Dict[str, str] = {}
+    if full_name is not None:
+        to_encrypt['name_encrypted'] = full_name
+        values['name_hash'] = encryption_service.hash_for_lookup(full_name)
 
     for key, value in update_data.items():
-        if key == 'first_name':
-            # Combine with existing last name if present in update
-            last = update_data.get('last_name')
-            full_name = value if not last else f"{value} {last}"
-            db_patient.name_encrypted = encryption_service.encrypt(full_name)
-            db_patient.name_hash = encryption_service.hash_for_lookup(full_name)
-        elif key == 'last_name':
-            # Combine with existing first name from decrypted stored name
-            current_name = encryption_service.decrypt(db_patient.name_encrypted) if db_patient.name_encrypted else ""
-            parts = current_name.split(" ", 1)
-            first = parts[0] if parts else ""
-            full_name = f"{first} {value}".strip()
-            db_patient.name_encrypted = encryption_service.encrypt(full_name)
-            db_patient.name_hash = encryption_service.hash_for_lookup(full_name)
-        elif key == 'phone_number' and value:
-            db_patient.phone_number_encrypted = encryption_service.encrypt(value)
-            db_patient.phone_hash = encryption_service.hash_for_lookup(value)
-        elif key == 'email' and value:
-            db_patient.email_encrypted = encryption_service.encrypt(value)
-            db_patient.email_hash = encryption_service.hash_for_lookup(value)
+        if key in ('first_name', 'last_name'):
+            continue
+        elif key == 'phone_number':
+            if value:
+                to_encrypt['phone_number_encrypted'] = value
+                values['phone_hash'] = encryption_service.hash_for_lookup(value)
+        elif key == 'email':
+            if value:
+                to_encrypt['email_encrypted'] = value
+                values['email_hash'] = encryption_service.hash_for_lookup(value)
         else:
-            setattr(db_patient, key, value)
-
-    db.commit()
-    db.refresh(db_patient)
+            values[key] = value
+    if to_encrypt:
+        values.update(zip(to_encrypt, encryption_service.encrypt_many(list(to_encrypt.values()))))
+
+    if not values:
+        return get_patient(db, patient_id)
+
+    # Single UPDATE ... RETURNING instead of fetch, setattr, commit, refresh
+    db_patient = db.execute(
+        update(models.Patient).where(models.Patient.id == patient_id).values(**values).returning(models.Patient),
+        execution_options={"populate_existing": True}
+    ).scalar_one_or_none()
+    if not db_patient:
+        db.rollback()
+        return None
+    if full_name is not None:
+        db.execute(delete(models.PatientNameToken).where(models.PatientNameToken.patient_id == patient_id))
+        token_rows = [{"patient_id": patient_id, "token_hash": h} for h in _patient_name_token_hashes(full_name)]
+        if token_rows:
+            db.execute(insert(models.PatientNameToken), token_rows)
+    with _keep_loaded_on_commit(db):
+        db.commit()
     return db_patient
 
 def delete_patient(db: Session, patient_id: int) -> bool:
-    db_patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
-    if not db_patient:
+    # Using soft delete, as one UPDATE without loading the row first
+    deleted = db.execute(
+        update(models.Patient)
+        .where(models.Patient.id == patient_id)
+        .values(is_active=False)
+    ).rowcount
+    if not deleted:
+        db.rollback()
         return False
-    # Using soft delete
-    setattr(db_patient, 'is_active', False)
     db.commit()
     return True
 
 # ==================== APPOINTMENT CRUD OPERATIONS (NEW) ====================
 
+def _load_appointment_with_relations(db: Session, appointment_id: int) -> Optional[models.Appointment]:
+    """(Re)load an appointment together with its patient and location in a single SELECT."""
+    return db.execute(
+        select(models.Appointment)
+        .options(joinedload(models.Appointment.patient), joinedload(models.Appointment.location))
+        .where(models.Appointment.id == appointment_id)
+        .execution_options(populate_existing=True)
+    ).unique().scalar_one_or_none()
+
 # --- REFACTORED: Accept slot_id and booking_type from the router ---
 async def create_appointment(
     db: Session, 
@@ -359,9 +612,10 @@ async def create_appointment(
     )
     
     try:
-        db.add(db_appointment)
-        db.commit()
-        db.refresh(db_appointment)
+        with _keep_loaded_on_commit(db):
+            db.add(db_appointment)
+            db.commit()
+        _bump_availability_version(db_appointment.location_id, db_appointment.start_time.date())
         logger.info(f"Successfully created appointment {db_appointment.id} for patient {db_appointment.patient_id}")
 
         # --- REFACTORED: Slot logic is now handled in the router. ---
@@ -384,15 +638,17 @@ async def create_appointment(
         # NEW: Create Google Calendar event
         try:
             # Lazy import to avoid circular dependency
-            from app.services.calendar_service import GoogleCalendarService
-            calendar_service = GoogleCalendarService()
-            patient = get_patient(db, db_appointment.patient_id)
-            location = get_location(db, db_appointment.location_id)
-            if patient and location and calendar_service.enabled:
-                event_id = await calendar_service.create_calendar_event(db_appointment, patient, location)
-                if event_id:
-                    update_appointment_calendar_event(db, db_appointment.id, event_id)
-                    db.refresh(db_appointment)
+            from app.services.calendar_service import get_calendar_service
+            calendar_service = get_calendar_service()
+            if calendar_service.enabled:
+                db_appointment = _load_appointment_with_relations(db, db_appointment.id)
+                patient, location = db_appointment.patient, db_appointment.location
+                if patient and location:
+                    event_id = await calendar_service.create_calendar_event(db_appointment, patient, location)
+                    if event_id:
+                        # The ORM UPDATE syncs the loaded row; keep it loaded across the commit
+                        with _keep_loaded_on_commit(db):
+                            update_appointment_calendar_event(db, db_appointment.id, event_id)
         except Exception as e:
             logger.error(f"Failed to create calendar event for appointment {db_appointment.id}: {e}")
             # Do not raise error, appointment is already created. Log and continue.
@@ -400,6 +656,8 @@ async def create_appointment(
         return db_appointment
     except IntegrityError as e:
         db.rollback()
+        if _is_appointment_overlap(e):
+            raise AppointmentConflictError("An appointment already exists at this time.")
         logger.error(f"Database integrity error on appointment creation: {e}")
         raise CRUDError("Could not create appointment due to a database integrity issue.")
     except SQLAlchemyError as e:
@@ -408,64 +666,103 @@ async def create_appointment(
         raise CRUDError("A database error occurred while creating the appointment.")
 
 async def update_appointment(db: Session, appointment_id: int, appointment_update: schemas.AppointmentUpdate) -> Optional[models.Appointment]:
-    db_appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
-    if not db_appointment:
-        return None
     update_data = appointment_update.dict(exclude_unset=True)
+    current = None
     # If times are being updated, enforce schedule and unavailable periods
     if 'start_time' in update_data or 'end_time' in update_data:
-        new_start = update_data.get('start_time', db_appointment.start_time)
-        new_end = update_data.get('end_time', db_appointment.end_time)
-        # Weekly schedule
-        day_of_week = new_start.weekday()
-        schedule = db.query(models.LocationSchedule).filter(
-            models.LocationSchedule.location_id == db_appointment.location_id,
-            models.LocationSchedule.day_of_week == day_of_week,
-            models.LocationSchedule.is_available == True
-        ).first()
-        if not schedule:
-            raise CRUDError("Selected day is unavailable for this location.")
-        schedule_start = datetime.combine(new_start.date(), schedule.start_time)
-        schedule_end = datetime.combine(new_start.date(), schedule.end_time)
-        if not (schedule_start <= new_start and new_end <= schedule_end):
-            raise CRUDError("Selected time is outside working hours for this location.")
-        if schedule.break_start and schedule.break_end:
-            break_start_dt = datetime.combine(new_start.date(), schedule.break_start)
-            break_end_dt = datetime.combine(new_start.date(), schedule.break_end)
-            if not (new_end <= break_start_dt or new_start >= break_end_dt):
-                raise CRUDError("Selected time falls within a break period.")
-        # Unavailable periods
-        overlaps_unavailable = db.query(models.UnavailablePeriod).filter(
-            models.UnavailablePeriod.location_id == db_appointment.location_id,
-            models.UnavailablePeriod.start_datetime < new_end,
-            models.UnavailablePeriod.end_datetime > new_start
+        current = db.execute(
+            select(models.Appointment.location_id, models.Appointment.start_time, models.Appointment.end_time)
+            .where(models.Appointment.id == appointment_id)
         ).first()
-        if overlaps_unavailable:
-            raise CRUDError("Selected time is blocked due to unavailability.")
+        if not current:
+            return None
+        new_start = update_data.get('start_time', current.start_time)
+        new_end = update_data.get('end_time', current.end_time)
+        # Start the Google Calendar busy lookup first so its network latency overlaps the DB checks
+        busy_task = None
+        try:
+            from app.services.calendar_service import get_calendar_service
+            calendar_service = get_calendar_service()
+            if calendar_service.enabled:
+                busy_task = asyncio.create_task(calendar_service.get_busy_times(new_start, new_end))
+                await asyncio.sleep(0)  # Let the task reach its HTTP call before the blocking DB work
+        except Exception:
+            pass
+        try:
+            # Weekly hours come from the schedule cache; only the unavailable-period check hits the DB
+            schedule = _get_schedule_hours(db, current.location_id, new_start.weekday())
+            if not schedule:
+                raise CRUDError("Selected day is unavailable for this location.")
+            schedule_start = datetime.combine(new_start.date(), schedule.start_time)
+            schedule_end = datetime.combine(new_start.date(), schedule.end_time)
+            if not (schedule_start <= new_start and new_end <= schedule_end):
+                raise CRUDError("Selected time is outside working hours for this location.")
+            if schedule.break_start and schedule.break_end:
+                break_start_dt = datetime.combine(new_start.date(), schedule.break_start)
+                break_end_dt = datetime.combine(new_start.date(), schedule.break_end)
+                if not (new_end <= break_start_dt or new_start >= break_end_dt):
+                    raise CRUDError("Selected time falls within a break period.")
+            # Unavailable periods
+            overlaps_unavailable = db.query(
+                exists().where(
+                    models.UnavailablePeriod.location_id == current.location_id,
+                    models.UnavailablePeriod.start_datetime < new_end,
+                    models.UnavailablePeriod.end_datetime > new_start
+                )
+            ).scalar()
+            if overlaps_unavailable:
+                raise CRUDError("Selected time is blocked due to unavailability.")
+        except Exception:
+            if busy_task:
+                busy_task.cancel()
+            raise
 
         # Google Calendar busy check on update
         try:
-            from app.services.calendar_service import GoogleCalendarService
-            calendar_service = GoogleCalendarService()
-            if calendar_service.enabled:
-                busy = await calendar_service.get_busy_times(new_start, new_end)
+            if busy_task:
+                busy = await busy_task
                 if busy:
                     raise CRUDError("Selected time is busy in Google Calendar.")
         except Exception:
             pass
-    for key, value in update_data.items():
-        setattr(db_appointment, key, value)
-    db.commit()
-    db.refresh(db_appointment)
+    if update_data:
+        # Single UPDATE instead of setattr per field on a pre-fetched row
+        try:
+            updated_id = db.execute(
+                update(models.Appointment)
+                .where(models.Appointment.id == appointment_id)
+                .values(**update_data)
+                .returning(models.Appointment.id)
+            ).scalar_one_or_none()
+            if updated_id is None:
+                db.rollback()
+                return None
+            # Reload the row with its patient and location in one query for the calendar sync below,
+            # inside the transaction so the commit can keep it loaded instead of expiring it again
+            db_appointment = _load_appointment_with_relations(db, appointment_id)
+            with _keep_loaded_on_commit(db):
+                db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if _is_appointment_overlap(e):
+                raise AppointmentConflictError("An appointment already exists at this time.")
+            raise
+    else:
+        db_appointment = _load_appointment_with_relations(db, appointment_id)
+    if not db_appointment:
+        return None
+    if update_data:
+        _bump_availability_version(db_appointment.location_id, db_appointment.start_time.date())
+        if current is not None and (current.location_id, current.start_time.date()) != (db_appointment.location_id, db_appointment.start_time.date()):
+            _bump_availability_version(current.location_id, current.start_time.date())
 
     # NEW: Update Google Calendar event
     try:
         if db_appointment.google_calendar_event_id:
-            from app.services.calendar_service import GoogleCalendarService
-            calendar_service = GoogleCalendarService()
+            from app.services.calendar_service import get_calendar_service
+            calendar_service = get_calendar_service()
             if calendar_service.enabled:
-                patient = get_patient(db, db_appointment.patient_id)
-                location = get_location(db, db_appointment.location_id)
+                patient, location = db_appointment.patient, db_appointment.location
                 if patient and location:
                     await calendar_service.update_calendar_event(
                         event_id=db_appointment.google_calendar_event_id,
@@ -489,22 +786,24 @@ async def delete_appointment(db: Session, appointment_id: int, db_appointment: O
     # NEW: Delete Google Calendar event
     try:
         if db_appointment.google_calendar_event_id:
-            from app.services.calendar_service import GoogleCalendarService
-            calendar_service = GoogleCalendarService()
+            from app.services.calendar_service import get_calendar_service
+            calendar_service = get_calendar_service()
             if calendar_service.enabled:
                 await calendar_service.delete_calendar_event(db_appointment.google_calendar_event_id)
     except Exception as e:
         logger.error(f"Failed to delete calendar event for appointment {db_appointment.id}: {e}")
 
+    location_id, appointment_date = db_appointment.location_id, db_appointment.start_time.date()
     db.delete(db_appointment)
     db.commit()
+    _bump_availability_version(location_id, appointment_date)
     return True
 
 # ==================== SCHEDULE CRUD OPERATIONS (NEW) ====================
 
 def get_location(db: Session, location_id: int) -> Optional[models.Location]:
     """Get a single location by ID."""
-    return db.query(models.Location).filter(models.Location.id == location_id).first()
+    return db.execute(_STMT_LOCATION_BY_ID, {"location_id": location_id}).scalar_one_or_none()
 
 def get_location_by_name(db: Session, name: str) -> Optional[models.Location]:
     """Get a single location by its name."""
@@ -523,66 +822,201 @@ def create_location(db: Session, location: schemas.LocationCreate) -> models.Loc
     return db_location
 
 def get_appointments_without_calendar_events(db: Session) -> List[models.Appointment]:
-    """Get all appointments that are missing a Google Calendar event ID."""
-    return db.query(models.Appointment).filter(models.Appointment.google_calendar_event_id.is_(None)).all()
+    """Get all appointments that are missing a Google Calendar event ID, with patient and location loaded."""
+    return db.query(models.Appointment).options(
+        joinedload(models.Appointment.patient),
+        joinedload(models.Appointment.location)
+    ).filter(models.Appointment.google_calendar_event_id.is_(None)).all()
 
 def update_appointment_calendar_event(db: Session, appointment_id: int, event_id: str) -> None:
     """Update an appointment with its Google Calendar event ID."""
     db.query(models.Appointment).filter(models.Appointment.id == appointment_id).update({'google_calendar_event_id': event_id})
     db.commit()
 
+def update_appointment_calendar_events_bulk(db: Session, pairs: List[Tuple[int, str]], chunk_size: int = 500) -> None:
+    """Store Google Calendar event IDs for many appointments, one UPDATE per chunk and a single commit."""
+    if not pairs:
+        return
+    try:
+        is_postgres = db.get_bind().dialect.name == "postgresql"
+        for offset in range(0, len(pairs), chunk_size):
+            chunk = pairs[offset:offset + chunk_size]
+            if is_postgres:
+                # UPDATE ... FROM (VALUES ...): one statement and one round trip for the whole chunk,
+                # where psycopg2's executemany would still send one UPDATE per row
+                event_ids = values_clause(
+                    column("id", Integer), column("event_id", String), name="event_ids"
+                ).data(chunk)
+                db.execute(
+                    update(models.Appointment)
+                    .where(models.Appointment.id == event_ids.c.id)
+                    .values(google_calendar_event_id=event_ids.c.event_id)
+                )
+            else:
+                # ORM bulk UPDATE by primary key: one UPDATE statement executed over the whole chunk
+                db.execute(update(models.Appointment), [
+                    {"id": appointment_id, "google_calendar_event_id": event_id}
+                    for appointment_id, event_id in chunk
+                ])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error storing calendar event IDs for {len(pairs)} appointments: {e}")
+        raise CRUDError("A database error occurred while storing calendar event IDs.")
+
 # ==================== SCHEDULE CRUD OPERATIONS (NEW) ====================
 
 def get_schedules_for_location(db: Session, location_id: int) -> List[models.LocationSchedule]:
     """Retrieve all schedule entries for a given location."""
     return db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).all()
 
+# --- Weekly availability bitmap (Redis negative cache) ---
+# Bit N is set when the location works on weekday N (Monday = 0). Lets get_available_slots
+# answer closed days without touching the database. A missing key means "unknown".
+def _availability_bitmap_key(location_id: int) -> str:
+    return f"avail:{location_id}"
+
+def _cache_availability_bitmap(location_id: int, schedules: List[models.LocationSchedule]) -> None:
+    """Store the weekly availability bitmap for a location in Redis."""
+    if not redis_client:
+        return
+    bitmap = 0
+    for schedule in schedules:
+        if schedule.is_available:
+            bitmap |= 1 << schedule.day_of_week
+    try:
+        redis_client.set(_availability_bitmap_key(location_id), bitmap)
+    except Exception as e:
+        logger.warning(f"Could not cache availability bitmap for location {location_id}: {e}")
+
+def _invalidate_availability_bitmap(location_id: int) -> None:
+    if not redis_client:
+        return
+    try:
+        redis_client.delete(_availability_bitmap_key(location_id))
+    except Exception as e:
+        logger.warning(f"Could not invalidate availability bitmap for location {location_id}: {e}")
+
+def _is_closed_by_bitmap(location_id: int, day_of_week: int) -> bool:
+    """True only when the cached bitmap says the location is closed on that weekday."""
+    if not redis_client:
+        return False
+    try:
+        cached = redis_client.get(_availability_bitmap_key(location_id))
+    except Exception as e:
+        logger.warning(f"Could not read availability bitmap for location {location_id}: {e}")
+        return False
+    bitmap = int(cached) if cached is not None else 0x7F
+    return not (bitmap >> day_of_week) & 1
+
+# --- Detailed availability cache (Redis) ---
+# Payload keys embed a per-location version (schedules, unavailable periods) and a
+# per-(location, date) version (appointments). Writers bump a version instead of deleting,
+# so a computation that raced a write is stored under a key nobody will read again.
+_AVAILABILITY_DETAIL_TTL = 30
+_AVAILABILITY_VERSION_TTL = 24 * 60 * 60
+
+def _availability_version_key(location_id: int, for_date: Optional[date] = None) -> str:
+    if for_date is None:
+        return f"availver:{location_id}"
+    return f"availver:{location_id}:{for_date.isoformat()}"
+
+def _bump_availability_version(location_id: int, for_date: Optional[date] = None) -> None:
+    """Invalidate cached detailed availability for a location, or one of its dates."""
+    if not redis_client:
+        return
+    key = _availability_version_key(location_id, for_date)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, _AVAILABILITY_VERSION_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not bump availability version {key}: {e}")
+
+def _detailed_slots_cache_key(location_id: int, for_date: date) -> Optional[str]:
+    if not redis_client:
+        return None
+    try:
+        location_version, date_version = redis_client.mget(
+            _availability_version_key(location_id), _availability_version_key(location_id, for_date)
+        )
+    except Exception as e:
+        logger.warning(f"Could not read availability versions for location {location_id}: {e}")
+        return None
+    return f"availdet:{location_id}:{for_date.isoformat()}:{location_version or 0}:{date_version or 0}"
+
+def _get_cached_detailed_slots(cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        cached = redis_client.get(cache_key)
+    except Exception as e:
+        logger.warning(f"Could not read cached availability {cache_key}: {e}")
+        return None
+    if cached is None:
+        return None
+    return [
+        {"time": time.fromisoformat(slot["time"]), "available": slot["available"], "reason": slot["reason"]}
+        for slot in json.loads(cached)
+    ]
+
+def _set_cached_detailed_slots(cache_key: str, slots: List[Dict[str, Any]]) -> None:
+    payload = json.dumps([{**slot, "time": slot["time"].isoformat()} for slot in slots])
+    try:
+        redis_client.setex(cache_key, _AVAILABILITY_DETAIL_TTL, payload)
+    except Exception as e:
+        logger.warning(f"Could not cache availability {cache_key}: {e}")
+
 def update_schedules_for_location(db: Session, location_id: int, schedules: List[schemas.LocationScheduleCreate]) -> List[models.LocationSchedule]:
     """Update or create schedule entries for a location for a full week."""
     logger.debug(f"[update_schedules_for_location] START for loc {location_id}. Received {len(schedules)} schedule entries.")
     logger.debug(f"[update_schedules_for_location] Incoming data: {schedules}")
     try:
-        # --- FIX 1: ADDED THIS BLOCK to define 'other_schedules_map' ---
         # --- OVERLAP VALIDATION --- START ---
         # This logic checks if the schedule for one location overlaps with the other.
         other_location_id = 2 if location_id == 1 else 1
         day_names_list = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        
-        # Fetch the other location's schedules and put them in a map for easy lookup
-        other_schedules_list = get_schedules_for_location(db=db, location_id=other_location_id)
-        other_schedules_map = {s.day_of_week: s for s in other_schedules_list}
-        logger.debug(f"[update_schedules_for_location] Checking for overlaps against location {other_location_id}. Found {len(other_schedules_map)} schedules.")
-        # --- END FIX 1 ---
 
+        # One query returns only the other location's rows that overlap a submitted working day
+        new_schedules_by_day = {}
+        day_predicates = []
         for new_day_schedule in schedules:
             if not new_day_schedule.is_available:
                 continue # This day is off, no conflict possible
-
-            other_day_schedule = other_schedules_map.get(new_day_schedule.day_of_week)
-            
-            # Check if the other location is also available on this day
-            if other_day_schedule and other_day_schedule.is_available:
-                day_name_str = day_names_list[new_day_schedule.day_of_week]
-                
-                # Ensure times are valid time objects (Pydantic should handle this, but checking is safe)
-                if not isinstance(new_day_schedule.start_time, time) or not isinstance(new_day_schedule.end_time, time) or \
-                   not isinstance(other_day_schedule.start_time, time) or not isinstance(other_day_schedule.end_time, time):
-                    logger.warning(f"Skipping overlap check for {day_name_str} due to invalid time data.")
-                    continue # Skip check if data is corrupt
-
-
-                overlap = (new_day_schedule.start_time < other_day_schedule.end_time) and \
-                          (new_day_schedule.end_time > other_day_schedule.start_time)
-                
-                if overlap:
-                    logger.warning(f"Overlap detected for {day_name_str} between loc {location_id} and {other_location_id}")
-                    other_loc_name = "Hospital" if other_location_id == 2 else "Clinic"
-                    current_loc_name = "Clinic" if location_id == 1 else "Hospital"
-                    raise CRUDError(
-                        f"Schedule Conflict for {day_name_str}: The time {new_day_schedule.start_time.strftime('%H:%M')}-{new_day_schedule.end_time.strftime('%H:%M')} "
-                        f"at {current_loc_name} conflicts with the schedule {other_day_schedule.start_time.strftime('%H:%M')}-{other_day_schedule.end_time.strftime('%H:%M')} "
-                        f"at the {other_loc_name}."
-                    )
+            if not isinstance(new_day_schedule.start_time, time) or not isinstance(new_day_schedule.end_time, time):
+                logger.warning(f"Skipping overlap check for {day_names_list[new_day_schedule.day_of_week]} due to invalid time data.")
+                continue # Skip check if data is corrupt
+            new_schedules_by_day[new_day_schedule.day_of_week] = new_day_schedule
+            day_predicates.append(and_(
+                models.LocationSchedule.day_of_week == new_day_schedule.day_of_week,
+                models.LocationSchedule.start_time < new_day_schedule.end_time,
+                models.LocationSchedule.end_time > new_day_schedule.start_time,
+            ))
+
+        conflict = None
+        if day_predicates:
+            conflict = db.execute(
+                select(
+                    models.LocationSchedule.day_of_week,
+                    models.LocationSchedule.start_time,
+                    models.LocationSchedule.end_time,
+                ).where(
+                    models.LocationSchedule.location_id == other_location_id,
+                    models.LocationSchedule.is_available == True,
+                    or_(*day_predicates),
+                ).order_by(models.LocationSchedule.day_of_week).limit(1)
+            ).first()
+
+        if conflict:
+            new_day_schedule = new_schedules_by_day[conflict.day_of_week]
+            day_name_str = day_names_list[conflict.day_of_week]
+            logger.warning(f"Overlap detected for {day_name_str} between loc {location_id} and {other_location_id}")
+            other_loc_name = "Hospital" if other_location_id == 2 else "Clinic"
+            current_loc_name = "Clinic" if location_id == 1 else "Hospital"
+            raise CRUDError(
+                f"Schedule Conflict for {day_name_str}: The time {new_day_schedule.start_time.strftime('%H:%M')}-{new_day_schedule.end_time.strftime('%H:%M')} "
+                f"at {current_loc_name} conflicts with the schedule {conflict.start_time.strftime('%H:%M')}-{conflict.end_time.strftime('%H:%M')} "
+                f"at the {other_loc_name}."
+            )
         logger.debug("[update_schedules_for_location] No location overlaps found.")
         # --- OVERLAP VALIDATION --- END ---
 
@@ -602,8 +1036,8 @@ def update_schedules_for_location(db: Session, location_id: int, schedules: List
                 duration = schedule_data.appointment_duration
                 if duration is None or duration <= 0:
                     # Use global default or fallback if per-day duration isn't set/valid
-                    interval_entry = get_system_config(db, "appointment_interval_minutes")
-                    duration = int(interval_entry.value) if interval_entry and str(interval_entry.value).isdigit() else 30
+                    interval_value = get_system_config_value(db, "appointment_interval_minutes")
+                    duration = int(interval_value) if interval_value is not None and str(interval_value).isdigit() else 30
                     logger.warning(f"[update_schedules_for_location] Invalid/missing duration for {day_name}, using fallback: {duration} min")
                 
                 if duration <= 0: # Still invalid after fallback
@@ -655,57 +1089,47 @@ def update_schedules_for_location(db: Session, location_id: int, schedules: List
                 except Exception as e: 
                      logger.error(f"[update_schedules_for_location] UNEXPECTED Error for {day_name}: {e}", exc_info=True)
                      raise CRUDError(f"An unknown error occurred while validating {day_name}.")
-        # Check count before delete
-        count_before = db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).count()
-        logger.debug(f"[update_schedules_for_location] Count before delete for loc {location_id}: {count_before}")
-        
-        # Delete existing schedules for the week for simplicity.
-        deleted_count = db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).delete()
-        logger.debug(f"[update_schedules_for_location] Deleted {deleted_count} existing schedules for loc {location_id}.")
-        
-        # Check count after delete (before flush/commit)
-        count_after_delete = db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).count()
-        logger.debug(f"[update_schedules_for_location] Count after delete (pre-commit) for loc {location_id}: {count_after_delete}")
-        # Note: Depending on transaction isolation, this count might not reflect the delete until commit.
-        # Let's flush to see the effect sooner if possible without full commit.
-        try:
-            db.flush() # Try to push delete to DB connection buffer
-            count_after_flush = db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).count()
-            logger.debug(f"[update_schedules_for_location] Count after delete (post-flush) for loc {location_id}: {count_after_flush}")
-        except SQLAlchemyError as flush_err:
-             logger.warning(f"[update_schedules_for_location] DB flush after delete failed (might be expected): {flush_err}")
-
-        new_schedules_models = []
-        for idx, schedule_data in enumerate(schedules):
-            # Ensure location_id is present, even though schema requires it, belt-and-suspenders approach.
+        rows = []
+        for schedule_data in schedules:
             if schedule_data.location_id != location_id:
                  logger.warning(f"[update_schedules_for_location] Mismatch! schedule_data location_id ({schedule_data.location_id}) != path location_id ({location_id}). Forcing path ID.")
-            
-            schedule_dict = schedule_data.dict()
-            schedule_dict['location_id'] = location_id # Explicitly ensure correct location_id
+            rows.append({**schedule_data.dict(), "location_id": location_id})  # Explicitly ensure correct location_id
+
+        # Days left out of the submitted week are removed, as before
+        submitted_days = [row["day_of_week"] for row in rows]
+        db.execute(
+            delete(models.LocationSchedule).where(
+                models.LocationSchedule.location_id == location_id,
+                models.LocationSchedule.day_of_week.notin_(submitted_days)
+            ),
+            execution_options={"synchronize_session": False}
+        )
 
-            new_schedule = models.LocationSchedule(**schedule_dict)
-            logger.debug(f"[update_schedules_for_location] Creating model instance {idx}: Day={new_schedule.day_of_week}, Start={new_schedule.start_time}, End={new_schedule.end_time}, Avail={new_schedule.is_available}, LocID={new_schedule.location_id}")
-            new_schedules_models.append(new_schedule)
-        
-        logger.debug(f"[update_schedules_for_location] Prepared {len(new_schedules_models)} model instances for addition.")
-        db.add_all(new_schedules_models)
-        
-        count_before_commit = db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).count()
-        logger.debug(f"[update_schedules_for_location] Count after add_all (pre-commit) for loc {location_id}: {count_before_commit}")
+        if rows:
+            # One upsert on uq_location_day writes the whole week in a single statement;
+            # existing rows keep their ids instead of being deleted and re-inserted
+            dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+            stmt = dialect_insert(models.LocationSchedule).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["location_id", "day_of_week"],
+                set_={c: stmt.excluded[c] for c in rows[0] if c not in ("location_id", "day_of_week")}
+            )
+            db.execute(stmt)
 
         logger.debug(f"[update_schedules_for_location] Committing transaction for loc {location_id}...")
         db.commit()
         logger.debug(f"[update_schedules_for_location] Commit successful for loc {location_id}.")
-        
+
         # Fetch from DB to confirm what was actually saved
         saved_schedules = db.query(models.LocationSchedule).filter(models.LocationSchedule.location_id == location_id).all()
-        logger.debug(f"[update_schedules_for_location] Fetched {len(saved_schedules)} schedules from DB post-commit for loc {location_id}.")
         for s in saved_schedules:
              logger.debug(f"  -> DB State: Day={s.day_of_week}, Start={s.start_time}, End={s.end_time}, Avail={s.is_available}, ID={s.id}")
-        
-        # Return the models added (note: IDs might not be populated correctly on the original list)
-        # It's safer to return the 'saved_schedules' fetched after commit.
+
+        _cache_availability_bitmap(location_id, saved_schedules)
+        _bump_availability_version(location_id)
+        for day_of_week in range(7):
+            _schedule_cache.pop((location_id, day_of_week))
+
         return saved_schedules
     except SQLAlchemyError as e:
         db.rollback()
@@ -739,13 +1163,16 @@ def update_schedule_for_day(db: Session, location_id: int, day_of_week: int, sch
         
         db.commit()
         db.refresh(db_schedule)
+        _invalidate_availability_bitmap(location_id)
+        _bump_availability_version(location_id)
+        _schedule_cache.pop((location_id, day_of_week))
         return db_schedule
     except SQLAlchemyError as e:
         db.rollback()
         logger.error(f"Error updating schedule for location {location_id}, day {day_of_week}: {e}")
         raise CRUDError("A database error occurred while updating the day schedule.")
 
-async def get_available_slots(db: Session, location_id: int, for_date: date) -> List[time]:
+async def get_available_slots(db: AsyncSession, location_id: int, for_date: date) -> List[time]:
     """
     Calculate available appointment slots for a given location and date,
     factoring in Google Calendar events.
@@ -753,171 +1180,127 @@ async def get_available_slots(db: Session, location_id: int, for_date: date) ->
     try:
         # 1. Get the weekly schedule for the given day
         day_of_week = for_date.weekday()  # Monday is 0 and Sunday is 6
-        schedule = db.query(models.LocationSchedule).filter(
-            models.LocationSchedule.location_id == location_id,
-            models.LocationSchedule.day_of_week == day_of_week,
-            models.LocationSchedule.is_available == True
-        ).first()
+        if _is_closed_by_bitmap(location_id, day_of_week):
+            return []  # Known closed day, skip the database entirely
+
+        schedule = _schedule_cache.get((location_id, day_of_week), _SCHEDULE_MISSING)
+        if schedule is _SCHEDULE_MISSING:
+            row = (await db.execute(_schedule_hours_stmt(location_id, day_of_week))).first()
+            schedule = _ScheduleHours(*row) if row else None
+            _schedule_cache.set((location_id, day_of_week), schedule)
 
         if not schedule:
             return []  # Doctor is not available on this day
 
-        # 2. Get all existing appointments for the day
         start_of_day = datetime.combine(for_date, time.min)
         end_of_day = datetime.combine(for_date, time.max)
-        
-        appointments = db.query(models.Appointment).filter(
-            models.Appointment.location_id == location_id,
-            models.Appointment.start_time >= start_of_day,
-            models.Appointment.end_time <= end_of_day,
-            models.Appointment.status != models.AppointmentStatus.cancelled
-        ).all()
-
-        booked_slots = set()
-        for appt in appointments:
-            slot_time = appt.start_time
-            while slot_time < appt.end_time:
-                booked_slots.add(slot_time.time())
-                slot_time += timedelta(minutes=15)
-
-        # 3. Get any manually blocked periods for the day
-        unavailable_periods = db.query(models.UnavailablePeriod).filter(
-            models.UnavailablePeriod.location_id == location_id,
-            models.UnavailablePeriod.start_datetime <= end_of_day,
-            models.UnavailablePeriod.end_datetime >= start_of_day
-        ).all()
+        # Candidate slots are the grid slots that fit entirely inside working hours; both
+        # backends below, and the detailed view, start from this same [first_slot, end_slot) range
+        first_slot, end_slot = _schedule_slot_range(schedule)
+
+        booked_mask = 0
+        if db.bind.dialect.name == "postgresql":
+            # 2-3. Postgres expands and subtracts appointments/unavailable periods in one query
+            candidate_slots = (await db.execute(_SQL_FREE_SLOTS_PG, {
+                "location_id": location_id,
+                "day_start": start_of_day,
+                "day_end": end_of_day,
+                "slot_start": start_of_day + timedelta(minutes=first_slot * _SLOT_MINUTES),
+                "slot_end": start_of_day + timedelta(minutes=end_slot * _SLOT_MINUTES),
+            })).scalars().all()
+        else:
+            # 2-3. Existing appointments and manually blocked periods for the day, in one query
+            for row in (await db.execute(_blocked_ranges_stmt(location_id, start_of_day, end_of_day))).all():
+                booked_mask |= _day_interval_mask(for_date, row.start, row.end)
 
-        for period in unavailable_periods:
-            slot_time = period.start_datetime
-            while slot_time < period.end_datetime:
-                if slot_time.date() == for_date:
-                    booked_slots.add(slot_time.time())
-                slot_time += timedelta(minutes=15)
+            schedule_mask = _interval_mask(first_slot, end_slot)
+            candidate_slots = [
+                time(i * _SLOT_MINUTES // 60, i * _SLOT_MINUTES % 60)
+                for i in range(_SLOTS_PER_DAY) if schedule_mask >> i & 1
+            ]
 
         # 4. NEW: Get busy times from Google Calendar
-        from app.services.calendar_service import GoogleCalendarService
-        calendar_service = GoogleCalendarService()
+        from app.services.calendar_service import get_calendar_service
+        calendar_service = get_calendar_service()
         if calendar_service.enabled:
-            gcal_busy_times = await calendar_service.get_busy_times(start_of_day, end_of_day)
+            gcal_busy_times = await calendar_service.get_busy_times_cached(start_of_day, end_of_day)
             for busy_period in gcal_busy_times:
-                slot_time = busy_period['start']
-                # Ensure timezone awareness matches for comparison
-                if slot_time.tzinfo is None:
-                    slot_time = slot_time.replace(tzinfo=start_of_day.tzinfo)
-
-                while slot_time < busy_period['end']:
-                    if slot_time.date() == for_date:
-                        booked_slots.add(slot_time.time())
-                    slot_time += timedelta(minutes=15)
-
-        # 5. Generate potential slots and filter out booked/unavailable ones
-        available_slots = []
-        slot_duration = timedelta(minutes=15)
-        current_time = datetime.combine(for_date, schedule.start_time)
-        end_time = datetime.combine(for_date, schedule.end_time)
-
-        while current_time < end_time:
-            if current_time.time() not in booked_slots:
-                available_slots.append(current_time.time())
-            current_time += slot_duration
-            
-        return available_slots
+                booked_mask |= _day_interval_mask(for_date, busy_period['start'], busy_period['end'])
+
+        # 5. Filter the candidate slots against whatever is still booked
+        return [slot for slot in candidate_slots if not booked_mask >> _slot_bit(slot) & 1]
     except SQLAlchemyError as e:
         logger.error(f"Error calculating available slots for location {location_id} on {for_date}: {e}")
         raise CRUDError("A database error occurred while calculating availability.")
 async def get_available_slots_detailed(db: Session, location_id: int, for_date: date) -> List[Dict[str, Any]]:
     """Return slot list with availability and reason (available, booked, break, unavailable, gcal_busy)."""
+    cache_key = _detailed_slots_cache_key(location_id, for_date)
+    if cache_key:
+        cached = _get_cached_detailed_slots(cache_key)
+        if cached is not None:
+            return cached
+    result = await _compute_available_slots_detailed(db, location_id, for_date)
+    if cache_key:
+        _set_cached_detailed_slots(cache_key, result)
+    return result
+
+async def _compute_available_slots_detailed(db: Session, location_id: int, for_date: date) -> List[Dict[str, Any]]:
     result: List[Dict[str, Any]] = []
     try:
-        day_of_week = for_date.weekday()
-        schedule = db.query(models.LocationSchedule).filter(
-            models.LocationSchedule.location_id == location_id,
-            models.LocationSchedule.day_of_week == day_of_week,
-            models.LocationSchedule.is_available == True
-        ).first()
+        schedule = _get_schedule_hours(db, location_id, for_date.weekday())
         if not schedule:
             return []
 
         start_of_day = datetime.combine(for_date, time.min)
         end_of_day = datetime.combine(for_date, time.max)
 
-        appointments = db.query(models.Appointment).filter(
-            models.Appointment.location_id == location_id,
-            models.Appointment.start_time >= start_of_day,
-            models.Appointment.end_time <= end_of_day,
-            models.Appointment.status != models.AppointmentStatus.cancelled
-        ).all()
-
-        booked_ranges = [(a.start_time, a.end_time) for a in appointments]
+        # One slot bitmask per reason, built in a single pass over each range list,
+        # so classifying a slot is a few bit tests instead of scanning every range
+        booked_mask = unavailable_mask = 0
+        for row in db.execute(_blocked_ranges_stmt(location_id, start_of_day, end_of_day)):
+            if row.kind == "booked":
+                booked_mask |= _day_interval_mask(for_date, row.start, row.end)
+            else:
+                unavailable_mask |= _day_interval_mask(for_date, row.start, row.end)
 
-        unavailable_periods = db.query(models.UnavailablePeriod).filter(
-            models.UnavailablePeriod.location_id == location_id,
-            models.UnavailablePeriod.start_datetime <= end_of_day,
-            models.UnavailablePeriod.end_datetime >= start_of_day
-        ).all()
-        unavailable_ranges = [(u.start_datetime, u.end_datetime) for u in unavailable_periods]
-
-        gcal_ranges: List[tuple] = []
+        gcal_mask = 0
         try:
-            from app.services.calendar_service import GoogleCalendarService
-            calendar_service = GoogleCalendarService()
+            from app.services.calendar_service import get_calendar_service
+            calendar_service = get_calendar_service()
             if calendar_service.enabled:
-                gcal_busy = await calendar_service.get_busy_times(start_of_day, end_of_day)
+                gcal_busy = await calendar_service.get_busy_times_cached(start_of_day, end_of_day)
                 for b in gcal_busy:
-                    gcal_ranges.append((b['start'], b['end']))
+                    gcal_mask |= _day_interval_mask(for_date, b['start'], b['end'])
         except Exception:
             pass
 
-        slot_duration = timedelta(minutes=15)
-        current_time = datetime.combine(for_date, schedule.start_time)
-        end_time = datetime.combine(for_date, schedule.end_time)
+        # Walk the same 15-minute grid as get_available_slots, so every slot is exactly one bit
+        slot_seconds = _SLOT_MINUTES * 60
+        first_slot, end_slot = _schedule_slot_range(schedule)
+        if schedule.break_start and schedule.break_end:
+            bs = _seconds_of_day(schedule.break_start)
+            be = _seconds_of_day(schedule.break_end)
+        else:
+            bs = be = None
 
-        while current_time < end_time:
-            reason = "available"
-            # break window
-            if schedule.break_start and schedule.break_end:
-                bs = datetime.combine(for_date, schedule.break_start)
-                be = datetime.combine(for_date, schedule.break_end)
-                if not (current_time + slot_duration <= bs or current_time >= be):
-                    reason = "break"
-
-            # booked
-            if reason == "available":
-                for s, e in booked_ranges:
-                    if s <= current_time < e:
-                        reason = "booked"
-                        break
-
-            # unavailable
-            if reason == "available":
-                for s, e in unavailable_ranges:
-                    if s <= current_time < e:
-                        reason = "unavailable"
-                        break
-
-            # gcal busy
-            if reason == "available":
-                for s, e in gcal_ranges:
-                    if s <= current_time < e:
-                        reason = "gcal_busy"
-                        break
+        for bit in range(first_slot, end_slot):
+            current_ts = bit * slot_seconds
+            in_break = bs is not None and not (current_ts + slot_seconds <= bs or current_ts >= be)
+            reason = _SLOT_REASON_BY_CODE[
+                in_break << 3 | (booked_mask >> bit & 1) << 2 | (unavailable_mask >> bit & 1) << 1 | (gcal_mask >> bit & 1)
+            ]
 
             result.append({
-                "time": current_time.time(),
+                "time": time(current_ts // 3600, current_ts % 3600 // 60, current_ts % 60),
                 "available": reason == "available",
                 "reason": reason
             })
-            current_time += slot_duration
 
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error calculating detailed slots for location {location_id} on {for_date}: {e}")
         raise CRUDError("A database error occurred while calculating availability.")
 
-    except SQLAlchemyError as e:
-        logger.error(f"Error calculating available slots for location {location_id} on {for_date}: {e}")
-        raise CRUDError("A database error occurred while calculating availability.")
-
 async def emergency_cancel_appointments(db: Session, block_date: date, reason: str, user_id: int) -> List[models.Appointment]:
     """
     Cancels all appointments for a given day, notifies patients via WhatsApp,
@@ -926,61 +1309,69 @@ async def emergency_cancel_appointments(db: Session, block_date: date, reason: s
     start_of_day = datetime.combine(block_date, time.min)
     end_of_day = datetime.combine(block_date, time.max)
 
-    # 1. Find all appointments for the given day that are not already cancelled
-    appointments_to_cancel = db.query(models.Appointment).filter(
-        models.Appointment.start_time >= start_of_day,
-        models.Appointment.end_time <= end_of_day,
-        models.Appointment.status != models.AppointmentStatus.cancelled
-    ).all()
+    # All database writes below share one transaction: either the whole day is blocked or nothing is
+    try:
+        # 1. Find all appointments for the given day that are not already cancelled
+        # Patients come back in one extra SELECT ... IN instead of one lookup per appointment
+        appointments_to_cancel = db.query(models.Appointment).options(
+            selectinload(models.Appointment.patient)
+        ).filter(
+            models.Appointment.start_time >= start_of_day,
+            models.Appointment.end_time <= end_of_day,
+            models.Appointment.status != models.AppointmentStatus.cancelled
+        ).all()
 
-    cancelled_appointments = []
-    for appointment in appointments_to_cancel:
-        # 2. Cancel the appointment
-        appointment.status = 'cancelled'
-        appointment.cancellation_reason = f"EMERGENCY: {reason}"
-        cancelled_appointments.append(appointment)
+        # 2. Cancel all of them with a single UPDATE instead of one UPDATE per row at flush time.
+        # The default session synchronization updates the already-loaded objects in place,
+        # so the returned list still reflects the cancellation.
+        cancelled_appointments = list(appointments_to_cancel)
+        if cancelled_appointments:
+            db.execute(
+                update(models.Appointment)
+                .where(models.Appointment.id.in_([a.id for a in cancelled_appointments]))
+                .values(
+                    status=models.AppointmentStatus.cancelled,
+                    cancellation_reason=f"EMERGENCY: {reason}"
+                )
+            )
 
-        # 3. Notify patient via WhatsApp
-        patient = get_patient(db, appointment.patient_id)
-        try:
-            if patient and patient.whatsapp_number:
-                from app.services.whatsapp_service import WhatsAppService
-                ws = WhatsAppService()
-                if ws.enabled:
-                    # We don't have separate first name; use full name
-                    patient_name = encryption_service.decrypt(patient.name_encrypted) if patient.name_encrypted else "Patient"
-                    message = (
-                        f"EMERGENCY CANCELLATION: Dear {patient_name}, due to an emergency, all appointments for "
-                        f"{block_date.strftime('%A, %B %d')} have been cancelled. We sincerely apologize for any inconvenience. "
-                        "Please contact us to reschedule."
-                    )
-                    await ws.send_message(patient.whatsapp_number, message)
-        except Exception:
-            pass
-    
-    # 4. Create an unavailable period for the entire day for both locations
-    for location_id in [1, 2]: # Assuming location IDs 1 and 2
-        unavailable_period_data = schemas.UnavailablePeriodCreate(
-            location_id=location_id,
-            start_datetime=start_of_day,
-            end_datetime=end_of_day,
-            reason=f"EMERGENCY: {reason}"
-        )
-        create_unavailable_period(db=db, period=unavailable_period_data, created_by=user_id)
-
-    # --- NEW: Update status of AVAILABLE slots to emergency_block ---
-    slots_to_block = db.query(models.AppointmentSlot).filter(
-        models.AppointmentSlot.start_time >= start_of_day,
-        models.AppointmentSlot.end_time <= end_of_day,
-        models.AppointmentSlot.location_id.in_([1, 2]), # Block for both locations
-        models.AppointmentSlot.status == models.SlotStatus.available
-    ).all()
+        # 3. Create an unavailable period for the entire day for both locations, in one INSERT
+        db.execute(insert(models.UnavailablePeriod), [
+            {
+                "location_id": location_id,
+                "start_datetime": start_of_day,
+                "end_datetime": end_of_day,
+                "reason": f"EMERGENCY: {reason}",
+                "created_by": user_id,
+            }
+            for location_id in [1, 2]  # Assuming location IDs 1 and 2
+        ])
+
+        # --- NEW: Update status of AVAILABLE slots to emergency_block ---
+        blocked_slot_ids = db.execute(
+            update(models.AppointmentSlot)
+            .where(
+                models.AppointmentSlot.start_time >= start_of_day,
+                models.AppointmentSlot.end_time <= end_of_day,
+                models.AppointmentSlot.location_id.in_([1, 2]), # Block for both locations
+                models.AppointmentSlot.status == models.SlotStatus.available
+            )
+            .values(status=models.SlotStatus.emergency_block)
+            .returning(models.AppointmentSlot.id)
+        ).scalars().all()
+        blocked_slot_count = len(blocked_slot_ids)
+        logger.info(f"Marked slots {blocked_slot_ids} as emergency_block for date {block_date}")
+
+        # The cancelled appointments and their patients are read again below and by the router
+        with _keep_loaded_on_commit(db):
+            db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error during emergency cancellation for {block_date}: {e}")
+        raise CRUDError("A database error occurred during emergency cancellation.")
 
-    blocked_slot_count = 0
-    for slot in slots_to_block:
-        slot.status = models.SlotStatus.emergency_block
-        blocked_slot_count += 1
-        logger.info(f"Marking slot {slot.id} as emergency_block for date {block_date}")
+    for location_id in {1, 2} | {a.location_id for a in cancelled_appointments}:
+        _bump_availability_version(location_id)
 
     # --- Add Audit Log for Slot Blocking --- 
     try:
@@ -997,7 +1388,36 @@ async def emergency_cancel_appointments(db: Session, block_date: date, reason: s
         logger.error(f"Failed to create audit log for emergency slot block on {block_date}: {log_error}")
     # --- End Audit Log ---
 
-    db.commit()
+    # 4. Notify patients via WhatsApp only once the cancellation is committed,
+    # concurrently but bounded so the provider isn't flooded
+    notifications = []
+    try:
+        from app.services.whatsapp_service import WhatsAppService
+        ws = WhatsAppService()
+        if ws.enabled:
+            for appointment in cancelled_appointments:
+                patient = appointment.patient
+                if patient and patient.whatsapp_number:
+                    # We don't have separate first name; use full name
+                    patient_name = encryption_service.decrypt(patient.name_encrypted) if patient.name_encrypted else "Patient"
+                    message = (
+                        f"EMERGENCY CANCELLATION: Dear {patient_name}, due to an emergency, all appointments for "
+                        f"{block_date.strftime('%A, %B %d')} have been cancelled. We sincerely apologize for any inconvenience. "
+                        "Please contact us to reschedule."
+                    )
+                    notifications.append((patient.whatsapp_number, message))
+    except Exception:
+        pass
+
+    if notifications:
+        send_limit = asyncio.Semaphore(16)
+
+        async def _notify(number: str, message: str):
+            async with send_limit:
+                return await ws.send_message(number, message)
+
+        await asyncio.gather(*(_notify(number, message) for number, message in notifications), return_exceptions=True)
+
     return cancelled_appointments
 
 def create_unavailable_period(db: Session, period: schemas.UnavailablePeriodCreate, created_by: int) -> models.UnavailablePeriod:
@@ -1012,6 +1432,7 @@ def create_unavailable_period(db: Session, period: schemas.UnavailablePeriodCrea
         db.add(db_period)
         db.commit()
         db.refresh(db_period)
+        _bump_availability_version(db_period.location_id)
         return db_period
     except SQLAlchemyError as e:
         db.rollback()
@@ -1052,12 +1473,16 @@ def update_unavailable_period(db: Session, period_id: int, period_update: schema
         if not db_period:
             return None
 
+        previous_location_id = db_period.location_id
         update_data = period_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_period, key, value)
         
         db.commit()
         db.refresh(db_period)
+        _bump_availability_version(db_period.location_id)
+        if previous_location_id != db_period.location_id:
+            _bump_availability_version(previous_location_id)
         return db_period
     except SQLAlchemyError as e:
         db.rollback()
@@ -1104,8 +1529,10 @@ def delete_unavailable_period(db: Session, period_id: int) -> bool:
         # --- End Audit Log ---
         
         # Now delete the period itself
+        location_id = db_period.location_id
         db.delete(db_period)
         db.commit()
+        _bump_availability_version(location_id)
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -1297,83 +1724,6 @@ def save_consultation_template(template_data: schemas.ConsultationTemplateCreate
         raise CRUDError(f"An unexpected error occurred: {e}")
 
 
-def _sanitize_filename(name: str) -> str:
-    """Converts a template name into a safe filename."""
-    name = name.lower().strip()
-    name = re.sub(r'\s+', '-', name) # replace spaces with hyphens
-    name = re.sub(r'[^\w\-]', '', name) # remove non-alphanumeric/hyphen
-    if not name:
-        name = "untitled"
-    return f"{name}.json"
-
-def save_consultation_template(template_data: schemas.ConsultationTemplateCreate) -> str:
-    """Saves a consultation template as a JSON file."""
-    
-    template_dir = "consultation_templates"
-    template_name = template_data.templateName
-    filename = _sanitize_filename(template_name)
-    filepath = os.path.join(template_dir, filename)
-
-    try:
-        # Ensure the directory exists
-        os.makedirs(template_dir, exist_ok=True)
-
-        # Serialize the Pydantic model to a dictionary
-        data_to_save = template_data.model_dump()
-        
-        # Add metadata consistent with the Response schema
-        data_to_save['id'] = template_name # Use name as ID
-        data_to_save['created_at'] = datetime.now(timezone.utc).isoformat()
-        data_to_save['updated_at'] = datetime.now(timezone.utc).isoformat()
-
-        # Write the data to the JSON file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, indent=4)
-        
-        logger.info(f"Successfully saved consultation template: {template_name} to {filepath}")
-        return template_name
-
-    except (IOError, OSError) as e:
-        logger.error(f"File I/O error saving template {template_name} to {filepath}: {e}", exc_info=True)
-        raise CRUDError(f"Failed to save template file: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error saving template {template_name}: {e}", exc_info=True)
-        raise CRUDError(f"An unexpected error occurred: {e}")
-
-# --- Patient History (General) CRUD ---
-def get_patient_history(db: Session, patient_id: int) -> Optional[models.PatientHistory]:
-    """Get general medical history for a patient."""
-    try:
-        return db.query(models.PatientHistory).filter(models.PatientHistory.patient_id == patient_id).first()
-    except SQLAlchemyError as e:
-        logger.error(f"Error fetching general history for patient {patient_id}: {e}")
-        raise CRUDError("Database error fetching general history.")
-
-def create_or_update_patient_history(db: Session, patient_id: int, history_data: schemas.PatientHistoryCreate) -> models.PatientHistory:
-    """Create or update general medical history for a patient."""
-    try:
-        db_history = get_patient_history(db, patient_id)
-        if db_history:
-            # Update
-            update_data = history_data.dict(exclude_unset=True, by_alias=True)
-            update_data.pop('patient_id', None)
-            for key, value in update_data.items():
-                setattr(db_history, key, value)
-        else:
-            # Create
-            create_data = history_data.dict(by_alias=True)
-            create_data['patient_id'] = patient_id # Explicitly set patient_id
-            db_history = models.PatientHistory(**create_data)
-            db.add(db_history)
-        db.commit()
-        db.refresh(db_history)
-        return db_history
-    except SQLAlchemyError as e:
-        db.rollback()
-        logger.error(f"Error saving general history for patient {patient_id}: {e}")
-        raise CRUDError("Database error saving general history.")
-
-
 # --- Patient History (General) CRUD ---
 def get_patient_history(db: Session, patient_id: int) -> Optional[models.PatientHistory]:
     """Get general medical history for a patient."""
@@ -1449,13 +1799,16 @@ def create_or_update_patient_menstrual_history(db: Session, patient_id: int, his
 
 # Deprecated create_audit_log replaced by compliance_logger.log_event
 # Legacy shim below
-def create_audit_log(db, user_id=None, action=None, category=None, details=None, **kwargs):
+def create_audit_log(db, user_id=None, action=None, category=None, details=None, username=None, role=None, **kwargs):
+    """Resolve the actor and hand the event to compliance_logger, whose writer owns the batched AuditLog insert."""
     try:
-        username_str = "System"
-        role_str = "system"  # Default role
-        
-        if user_id:
-            user = db.query(models.User).filter(models.User.id == user_id).first()
+        username_str = username or "System"
+        role_str = role or "system"  # Default role
+
+        # Callers that already know the actor pass username/role and skip the lookup; otherwise
+        # get_user usually finds the authenticated user in the session identity map without a SELECT
+        if user_id and not username:
+            user = get_user(db, user_id=user_id)
             if user:
                 username_str = user.username
                 # Check if role is an enum and get its value
@@ -1479,9 +1832,60 @@ def create_audit_log(db, user_id=None, action=None, category=None, details=None,
     except Exception as e:
         logger.error(f'[Shim] Failed to log event: {e}')
 
+# app/crud.py (Replacement for the existing get_audit_logs function)
 
+def _audit_log_select(
+    user_id: Optional[int] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Build the filtered audit log SELECT shared by get_audit_logs and iter_audit_logs.
 
-# app/crud.py (Replacement for the existing get_audit_logs function)
+    Returned as a lambda_stmt: each filter is a separate lambda, so SQLAlchemy caches the
+    compiled SQL once per filter combination and later calls only bind new parameter values.
+    """
+    # Select only the columns AuditLogResponse needs as plain rows: no ORM instances,
+    # identity map or relationship loading. The username fallback is a correlated scalar
+    # subquery, so no join widens the row and NULL user_ids resolve to NULL cheaply.
+    stmt = lambda_stmt(lambda: select(
+        models.AuditLog.id,
+        models.AuditLog.user_id,
+        # Prefer the username saved with the log, fall back to the related user
+        func.coalesce(
+            models.AuditLog.username,
+            select(models.User.username)
+            .where(models.User.id == models.AuditLog.user_id)
+            .correlate(models.AuditLog)
+            .scalar_subquery()
+        ).label('username'),
+        models.AuditLog.action,
+        models.AuditLog.category,
+        models.AuditLog.severity,
+        models.AuditLog.resource_type,
+        models.AuditLog.resource_id,
+        models.AuditLog.details,
+        models.AuditLog.old_values,
+        models.AuditLog.new_values,
+        models.AuditLog.ip_address,
+        models.AuditLog.user_agent,
+        models.AuditLog.timestamp,
+    ))
+
+    if user_id:
+        stmt += lambda s: s.where(models.AuditLog.user_id == user_id)
+    if category:
+        stmt += lambda s: s.where(models.AuditLog.category == category)
+    if severity:
+        stmt += lambda s: s.where(models.AuditLog.severity == severity)
+    if start_date:
+        stmt += lambda s: s.where(models.AuditLog.timestamp >= start_date)
+    if end_date:
+        # Add one day to end_date to include the entire day
+        end_exclusive = end_date + timedelta(days=1)
+        stmt += lambda s: s.where(models.AuditLog.timestamp < end_exclusive)
+    return stmt
 
 def get_audit_logs(
     db: Session, 
@@ -1491,159 +1895,291 @@ def get_audit_logs(
     category: Optional[str] = None,
     severity: Optional[str] = None,
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None
-) -> List[models.AuditLog]:
-    """Retrieve audit logs with filtering and eagerly load username.""" 
+    end_date: Optional[date] = None,
+    before_timestamp: Optional[datetime] = None,
+    before_id: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Retrieve a page of audit logs, as plain dicts, with filtering and username resolved.
+
+    Returns (logs, total) where total is the number of rows matching the filters on every
+    page. The first page counts them in the same query via count(*) OVER (); later pages
+    cannot see the rows before the cursor or offset, so they run one extra COUNT.
+    Pass the timestamp/id of the last row seen as before_timestamp/before_id to page with a
+    keyset cursor; skip is kept for backwards compatibility and is ignored when a cursor is given.
+    """
+    has_cursor = before_timestamp is not None and before_id is not None
+    first_page = not has_cursor and not skip
     try:
-        # Use left outer join to include logs even if the user has been deleted (user_id is NULL)
-        query = db.query(models.AuditLog).outerjoin(models.User).options(
-            # Eagerly load the User relationship
-            joinedload(models.AuditLog.user)
-        )
-        
-        # Add a conditional clause to populate the AuditLog.username field 
-        # from the joined User.username if AuditLog.username is NULL.
-        # This fixes logs where the username wasn't saved initially.
-        query = query.with_entities(
-            models.AuditLog.id,
-            models.AuditLog.user_id,
-            # Use COALESCE to prioritize AuditLog.username (if saved during login) 
-            # and fall back to User.username via join.
-            func.coalesce(models.AuditLog.username, models.User.username).label('username'),
-            models.AuditLog.action,
-            models.AuditLog.category,
-            models.AuditLog.severity,
-            models.AuditLog.resource_type,
-            models.AuditLog.resource_id,
-            models.AuditLog.details,
-            models.AuditLog.old_values,
-            models.AuditLog.new_values,
-            models.AuditLog.ip_address,
-            models.AuditLog.user_agent,
-            models.AuditLog.timestamp,
-        )
-        
-        if user_id:
-            query = query.filter(models.AuditLog.user_id == user_id)
-        if category:
-            query = query.filter(models.AuditLog.category == category)
-        if severity:
-            query = query.filter(models.AuditLog.severity == severity)
-        if start_date:
-            query = query.filter(models.AuditLog.timestamp >= start_date)
-        if end_date:
-            # Add one day to end_date to include the entire day
-            query = query.filter(models.AuditLog.timestamp < (end_date + timedelta(days=1)))
-            
-        # The query now returns tuples, so we map them back to the AuditLog model structure manually for the Pydantic parser.
-        raw_logs = query.order_by(models.AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+        stmt = _audit_log_select(user_id, category, severity, start_date, end_date)
+        if first_page:
+            # Filtered total, computed before LIMIT
+            stmt += lambda s: s.add_columns(func.count().over().label("total"))
+        if has_cursor:
+            # Seek past the cursor via idx_audit_timestamp_id instead of walking OFFSET rows
+            stmt += lambda s: s.where(
+                tuple_(models.AuditLog.timestamp, models.AuditLog.id) < tuple_(before_timestamp, before_id)
+            )
+        elif skip:
+            stmt += lambda s: s.offset(skip)
+        stmt += lambda s: s.order_by(models.AuditLog.timestamp.desc(), models.AuditLog.id.desc()).limit(limit)
+
+        # Logs of soft-deleted users still show their username
+        rows = db.execute(stmt, execution_options={"include_deleted": True}).all()
+        if first_page:
+            total = rows[0].total if rows else 0
+        else:
+            count_stmt = _audit_log_select(user_id, category, severity, start_date, end_date)
+            count_stmt += lambda s: s.with_only_columns(func.count(models.AuditLog.id))
+            total = db.execute(count_stmt).scalar_one()
         
-        # Manually reconstruct objects needed by the Pydantic AuditLogResponse schema
+        # Plain dictionaries are what the Pydantic AuditLogResponse schema is fed
         reconstructed_logs = []
-        for raw_log in raw_logs:
-            # Create a dictionary representing the AuditLog model instance
-            log_dict = {
-                'id': raw_log.id,
-                'user_id': raw_log.user_id,
-                'username': raw_log.username, # Now populated by COALESCE
-                'action': raw_log.action,
-                'category': raw_log.category,
-                'severity': raw_log.severity,
-                'resource_type': raw_log.resource_type,
-                'resource_id': raw_log.resource_id,
-                'details': raw_log.details,
-                'old_values': raw_log.old_values,
-                'new_values': raw_log.new_values,
-                'ip_address': raw_log.ip_address,
-                'user_agent': raw_log.user_agent,
-                'timestamp': raw_log.timestamp,
-            }
-            # The Pydantic model AuditLogResponse relies on the presence of these fields.
+        for row in rows:
+            log_dict = row._asdict()
+            log_dict.pop('total', None)
             reconstructed_logs.append(log_dict)
 
         # The reconstructed dictionaries should now be correctly mapped by the Pydantic response model.
-        return reconstructed_logs
+        return reconstructed_logs, total
         
     except SQLAlchemyError as e:
         logger.error(f"Error fetching audit logs: {e}")
         # Re-raise the error as a CRUDError, which is handled by FastAPI
         raise CRUDError("A database error occurred while fetching audit logs.")
 
+def iter_audit_logs(
+    db: Session,
+    user_id: Optional[int] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    chunk_size: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """Stream every matching audit log (newest first) in chunks via a server-side cursor, for exports."""
+    stmt = _audit_log_select(user_id, category, severity, start_date, end_date)
+    stmt += lambda s: s.order_by(models.AuditLog.timestamp.desc(), models.AuditLog.id.desc())
+    try:
+        for row in db.execute(stmt, execution_options={"yield_per": chunk_size, "include_deleted": True}):
+            yield row._asdict()
+    except SQLAlchemyError as e:
+        logger.error(f"Error streaming audit logs: {e}")
+        raise CRUDError("A database error occurred while exporting audit logs.")
+
+
 
 # ==================== ALL OTHER CRUD FUNCTIONS (RESTORED) ====================
 
-def get_dashboard_stats(db: Session, location_id: int = None) -> Dict[str, Any]:
-    """Get comprehensive dashboard statistics"""
+_SQL_DASHBOARD_STATS_MV = text("""
+    SELECT total_patients, total_appointments, appointments_today, pending_appointments, appointments_week
+    FROM mv_dashboard_stats
+    WHERE bucket = :bucket
+""")
+
+# Every worker schedules the refresh; only the one holding this session-level advisory lock runs it
+_DASHBOARD_REFRESH_LOCK_KEY = 7_350_411_907
+_dashboard_refresh_conn = None  # This worker's lock-holding connection, once it has won the lock
+
+def refresh_dashboard_stats_view() -> None:
+    """Refresh mv_dashboard_stats without blocking readers; run periodically from a scheduler.
+
+    Once per deployment: the first worker to take the advisory lock keeps it on a dedicated
+    connection and does every refresh; the others skip. If that worker exits or its connection
+    breaks, the lock is released and another worker picks it up on its next tick.
+    """
+    global _dashboard_refresh_conn
+    from .database import engine
+    if engine.dialect.name != "postgresql":
+        return
     try:
-        stats = {}
-        stats["total_patients"] = db.query(models.Patient).count()
-        stats["total_appointments"] = db.query(models.Appointment).count()
-        stats["appointments_today"] = db.query(models.Appointment).filter(func.date(models.Appointment.start_time) == date.today()).count()
-        # REFACTORED: Use explicit Enum values to avoid string/casting issues and ensure compatibility with new models
-        stats["pending_appointments"] = db.query(models.Appointment).filter(
-            models.Appointment.status.in_([models.AppointmentStatus.scheduled, models.AppointmentStatus.confirmed])
-        ).count()
-        stats["appointments_week"] = db.query(models.Appointment).filter(models.Appointment.start_time >= (datetime.now(timezone.utc) - timedelta(days=7))).count()
-        return stats
+        if _dashboard_refresh_conn is None:
+            conn = engine.connect()
+            if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _DASHBOARD_REFRESH_LOCK_KEY}).scalar():
+                conn.close()
+                return
+            conn.commit()
+            _dashboard_refresh_conn = conn
+        _dashboard_refresh_conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_stats"))
+        _dashboard_refresh_conn.commit()
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not refresh mv_dashboard_stats: {e}")
+        if _dashboard_refresh_conn is not None:
+            # Close the DBAPI connection rather than pooling it, so the lock goes with it
+            _dashboard_refresh_conn.invalidate()
+            _dashboard_refresh_conn.close()
+            _dashboard_refresh_conn = None
+
+def _get_dashboard_stats_from_view(db: Session, location_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Read precomputed stats from mv_dashboard_stats, or None if the view is unavailable or has no row yet."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        # Savepoint so a missing view (e.g. schema created without alembic) doesn't abort the transaction
+        with db.begin_nested():
+            row = db.execute(_SQL_DASHBOARD_STATS_MV, {"bucket": location_id or 0}).one_or_none()
+    except SQLAlchemyError as e:
+        logger.debug(f"mv_dashboard_stats unavailable, using live counts: {e}")
+        return None
+    return dict(row._mapping) if row else None
+
+# Planner row estimate for patients (kept current by VACUUM/ANALYZE); falls back to an exact
+# count when the table has never been analyzed and reltuples is still -1.
+_PATIENT_COUNT_ESTIMATE_PG = literal_column("""(
+    SELECT CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint ELSE (SELECT count(*) FROM patients) END
+    FROM pg_class c WHERE c.oid = 'patients'::regclass
+)""")
+
+def get_dashboard_stats(db: Session, location_id: int = None, accurate: bool = False) -> Dict[str, Any]:
+    """Get comprehensive dashboard statistics, optionally scoped to one location.
+
+    By default the counts come from mv_dashboard_stats, refreshed once a minute, so
+    appointments_today and pending_appointments can be up to 60 s stale and "today" rolls
+    over up to a minute after midnight; total_patients may be a planner estimate.
+    Pass accurate=True for exact live counts.
+    """
+    if not accurate:
+        # Precomputed path: no table scans at all
+        stats = _get_dashboard_stats_from_view(db, location_id)
+        if stats is not None:
+            return stats
+    try:
+        # Live fallback (first boot before the view is refreshed, or non-Postgres databases)
+        # One round trip: patients via a scalar subquery, appointment counts via
+        # filtered aggregates over a single scan of the appointments table.
+        # Take "now" once so every aggregate is evaluated against the same instant
+        now = datetime.now(timezone.utc).astimezone()  # Server-local, timezone-aware
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow_start = today_start + timedelta(days=1)
+        week_ago = now - timedelta(days=7)
+        if not accurate and db.get_bind().dialect.name == "postgresql":
+            total_patients = _PATIENT_COUNT_ESTIMATE_PG
+        else:
+            total_patients = select(func.count(models.Patient.id)).scalar_subquery()
+        # Patients are not tied to a location, so only the appointment counts are scoped;
+        # the (location_id, start_time) index serves the filtered scan.
+        appointment_filters = []
+        if location_id:
+            appointment_filters.append(models.Appointment.location_id == location_id)
+        row = db.execute(select(
+            total_patients.label("total_patients"),
+            func.count(models.Appointment.id).label("total_appointments"),
+            # Sargable range instead of func.date(start_time) so the start_time index is usable
+            func.count(models.Appointment.id).filter(
+                models.Appointment.start_time >= today_start,
+                models.Appointment.start_time < tomorrow_start
+            ).label("appointments_today"),
+            # REFACTORED: Use explicit Enum values to avoid string/casting issues and ensure compatibility with new models
+            func.count(models.Appointment.id).filter(
+                models.Appointment.status.in_([models.AppointmentStatus.scheduled, models.AppointmentStatus.confirmed])
+            ).label("pending_appointments"),
+            func.count(models.Appointment.id).filter(
+                models.Appointment.start_time >= week_ago
+            ).label("appointments_week"),
+        ).select_from(models.Appointment).where(*appointment_filters)).one()
+        return dict(row._mapping)
     except SQLAlchemyError as e:
         logger.error(f"Error fetching dashboard stats: {str(e)}")
         raise CRUDError(f"Database error: {str(e)}")
 
+def has_pending_appointments(db: Session, location_id: int = None) -> bool:
+    """Cheap yes/no for header badges: stops at the first scheduled/confirmed appointment instead of counting."""
+    try:
+        stmt = select(literal(1)).select_from(models.Appointment).where(
+            models.Appointment.status.in_([models.AppointmentStatus.scheduled, models.AppointmentStatus.confirmed])
+        )
+        if location_id:
+            stmt = stmt.where(models.Appointment.location_id == location_id)
+        return db.execute(stmt.limit(1)).scalar() is not None
+    except SQLAlchemyError as e:
+        logger.error(f"Error checking for pending appointments: {str(e)}")
+        raise CRUDError(f"Database error: {str(e)}")
+
 def get_appointments(db: Session, skip: int = 0, limit: int = 100, **kwargs) -> List[models.Appointment]:
     """Get appointments with comprehensive filtering"""
     try:
+        # Only load the columns AppointmentResponse / PatientResponse serialize; the patient
+        # comes from one IN query rather than widening every appointment row with a join.
         # FIX: Eagerly load new 'slot' relationship to prevent lazy-loading crashes during serialization
         return db.query(models.Appointment).options(
-            joinedload(models.Appointment.patient),
+            load_only(
+                models.Appointment.id, models.Appointment.patient_id, models.Appointment.location_id,
+                models.Appointment.user_id, models.Appointment.slot_id, models.Appointment.start_time,
+                models.Appointment.end_time, models.Appointment.reason, models.Appointment.notes,
+                models.Appointment.appointment_type, models.Appointment.status,
+                models.Appointment.google_calendar_event_id, models.Appointment.created_at,
+                models.Appointment.updated_at
+            ),
+            selectinload(models.Appointment.patient).load_only(
+                models.Patient.id, models.Patient.name_encrypted, models.Patient.phone_number_encrypted,
+                models.Patient.email_encrypted, models.Patient.phone_hash, models.Patient.email_hash,
+                models.Patient.date_of_birth, models.Patient.city, models.Patient.gender,
+                models.Patient.preferred_communication, models.Patient.whatsapp_number,
+                models.Patient.whatsapp_opt_in, models.Patient.hipaa_authorization,
+                models.Patient.consent_to_treatment, models.Patient.created_by,
+                models.Patient.created_at, models.Patient.updated_at
+            ),
             joinedload(models.Appointment.slot)
         ).offset(skip).limit(limit).all()
     except SQLAlchemyError as e:
         logger.error(f"Error fetching appointments: {str(e)}")
         raise CRUDError(f"Database error: {str(e)}")
 
-def get_appointments_by_date_range(db: Session, start_date: datetime, end_date: datetime, location_id: Optional[int] = None) -> List[models.Appointment]:
+def iter_appointments_by_date_range(
+    db: Session,
+    start_date: datetime,
+    end_date: datetime,
+    location_id: Optional[int] = None,
+    chunk_size: int = 500
+) -> Iterator[models.Appointment]:
+    """Stream appointments overlapping the range in start order, chunk_size rows at a time."""
+    # FIX: Eagerly load new 'slot' relationship for date range queries
+    filters = [
+        # Use overlap logic for calendars: (StartA < EndB) AND (EndA > StartB)
+        models.Appointment.start_time < end_date,
+        models.Appointment.end_time > start_date
+    ]
+    if location_id is not None:
+        filters.append(models.Appointment.location_id == location_id)
+    # Both eager loads are many-to-one, which joinedload supports together with yield_per
+    stmt = select(models.Appointment).options(
+        joinedload(models.Appointment.patient),
+        joinedload(models.Appointment.slot)
+    ).where(*filters).order_by(models.Appointment.start_time.asc())
     try:
-        # --- START EDIT: Add location_id filter ---
-        # FIX: Eagerly load new 'slot' relationship for date range queries
-        query = db.query(models.Appointment).options(
-            joinedload(models.Appointment.patient),
-            joinedload(models.Appointment.slot)
-        ).filter(
-            # Use overlap logic for calendars: (StartA < EndB) AND (EndA > StartB)
-            models.Appointment.start_time < end_date,
-            models.Appointment.end_time > start_date
-        )
-        if location_id is not None:
-            query = query.filter(models.Appointment.location_id == location_id)
-        # --- END EDIT ---
-        return query.order_by(models.Appointment.start_time.asc()).all()
+        yield from db.execute(stmt, execution_options={"yield_per": chunk_size}).scalars()
     except SQLAlchemyError as e:
         logger.error(f"Error fetching appointments by range: {e}")
         raise CRUDError("A database error occurred while fetching appointments.")
 
+def get_appointments_by_date_range(db: Session, start_date: datetime, end_date: datetime, location_id: Optional[int] = None) -> List[models.Appointment]:
+    return list(iter_appointments_by_date_range(db, start_date, end_date, location_id))
+
 # ==================== MISSING HELPERS USED BY ROUTERS/SERVICES ====================
 
 def get_patient_by_phone(db: Session, phone_number: str) -> Optional[models.Patient]:
     if not phone_number:
         return None
     phone_hash = encryption_service.hash_for_lookup(phone_number)
-    return db.query(models.Patient).filter(models.Patient.phone_hash == phone_hash).first()
+    return db.execute(_STMT_PATIENT_BY_PHONE_HASH, {"phone_hash": phone_hash}).scalars().first()
 
 def get_patient_by_email(db: Session, email: str) -> Optional[models.Patient]:
     if not email:
         return None
     email_hash = encryption_service.hash_for_lookup(email)
-    return db.query(models.Patient).filter(models.Patient.email_hash == email_hash).first()
+    return db.execute(_STMT_PATIENT_BY_EMAIL_HASH, {"email_hash": email_hash}).scalars().first()
 
 def get_patient_by_phone_hash(db: Session, phone_number: str) -> Optional[models.Patient]:
     # Alias for services expecting this name
     return get_patient_by_phone(db, phone_number)
 
+def _document_checksum(file_path: str) -> str:
+    """SHA-256 of the stored path; hashlib's OpenSSL backend already uses the CPU's SHA extensions."""
+    return hashlib.sha256(file_path.encode()).hexdigest()
+
 def create_patient_document(db: Session, patient_id: int, file_path: str, description: str, user_id: Optional[int]) -> models.Document:
-    import hashlib as _hashlib
     # Encrypt stored file path and compute a simple checksum of the path
     encrypted_path = encryption_service.encrypt(file_path)
-    checksum = _hashlib.sha256(file_path.encode()).hexdigest()
+    checksum = _document_checksum(file_path)
     document = models.Document(
         patient_id=patient_id,
         name=file_path.split('/')[-1],
@@ -1669,9 +2205,8 @@ def create_document_for_patient(
     mime_type: Optional[str] = None,
     file_size: Optional[int] = None,
 ) -> models.Document:
-    import hashlib as _hashlib
     encrypted_path = encryption_service.encrypt(file_path)
-    checksum = _hashlib.sha256(file_path.encode()).hexdigest()
+    checksum = _document_checksum(file_path)
     document = models.Document(
         patient_id=patient_id,
         name=file_path.split('/')[-1],
@@ -1709,13 +2244,21 @@ def create_or_get_patient_from_payload(db: Session, payload: Dict[str, Any], cre
     """
     phone = payload.get('phone_number')
     email = payload.get('email')
-    existing = None
+    # One lookup for both identifiers; a phone match still wins over an email match.
+    # The separate phone_hash/email_hash indexes serve the OR (bitmap OR on Postgres).
+    match_filters = []
     if phone:
-        existing = get_patient_by_phone(db, phone)
-    if not existing and email:
-        existing = get_patient_by_email(db, email)
-    if existing:
-        return existing
+        phone_hash = encryption_service.hash_for_lookup(phone)
+        match_filters.append(models.Patient.phone_hash == phone_hash)
+    if email:
+        match_filters.append(models.Patient.email_hash == encryption_service.hash_for_lookup(email))
+    if match_filters:
+        stmt = select(models.Patient).where(or_(*match_filters)).limit(1)
+        if phone:
+            stmt = stmt.order_by(case((models.Patient.phone_hash == phone_hash, 0), else_=1))
+        existing = db.execute(stmt).scalars().first()
+        if existing:
+            return existing
     patient_schema = schemas.PatientCreate(
         first_name=payload.get('first_name') or payload.get('name') or 'Patient',
         last_name=payload.get('last_name'),
@@ -1733,27 +2276,32 @@ def has_active_appointment(db: Session, phone_number: str) -> bool:
     if not patient:
         return False
     now = datetime.now()
-    return db.query(models.Appointment).filter(
-        models.Appointment.patient_id == patient.id,
-        models.Appointment.start_time >= now,
-        models.Appointment.status.in_([models.AppointmentStatus.scheduled, models.AppointmentStatus.confirmed])
-    ).first() is not None
+    return db.execute(
+        select(models.Appointment.id).where(
+            models.Appointment.patient_id == patient.id,
+            models.Appointment.start_time >= now,
+            models.Appointment.status.in_([models.AppointmentStatus.scheduled, models.AppointmentStatus.confirmed])
+        ).limit(1)
+    ).scalar() is not None
 
 def create_appointment_with_validation(db: Session, appointment_data: schemas.AppointmentCreate, phone_number: Optional[str] = None) -> models.Appointment:
     data = appointment_data.dict()
     # Basic conflict check
-    conflict = db.query(models.Appointment).filter(
-        models.Appointment.location_id == data['location_id'],
-        models.Appointment.start_time < data['end_time'],
-        models.Appointment.end_time > data['start_time'],
-        models.Appointment.status != models.AppointmentStatus.cancelled
-    ).first()
-    if conflict:
+    conflict = db.execute(
+        select(models.Appointment.id).where(
+            models.Appointment.location_id == data['location_id'],
+            models.Appointment.start_time < data['end_time'],
+            models.Appointment.end_time > data['start_time'],
+            models.Appointment.status != models.AppointmentStatus.cancelled
+        ).limit(1)
+    ).scalar()
+    if conflict is not None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Time slot is not available")
     appt = models.Appointment(**data)
     db.add(appt)
     db.commit()
     db.refresh(appt)
+    _bump_availability_version(appt.location_id, appt.start_time.date())
     return appt
 
 def get_patient_upcoming_appointments(db: Session, patient_id: int) -> List[models.Appointment]:
@@ -1764,7 +2312,7 @@ def get_patient_upcoming_appointments(db: Session, patient_id: int) -> List[mode
     ).order_by(models.Appointment.start_time.asc()).all()
 
 def get_whatsapp_session(db: Session, phone_number: str) -> Optional[models.WhatsAppSession]:
-    return db.query(models.WhatsAppSession).filter(models.WhatsAppSession.phone_number == phone_number, models.WhatsAppSession.is_active == True).first()
+    return db.execute(_STMT_ACTIVE_WHATSAPP_SESSION, {"phone_number": phone_number}).scalars().first()
 
 def create_whatsapp_session(db: Session, phone_number: str) -> models.WhatsAppSession:
     session = models.WhatsAppSession(
@@ -1967,11 +2515,13 @@ def fix_consistency_issues(db: Session) -> schemas.ConsistencyFixReport:
         for issue in issues_report["status_counter_mismatches"]:
             try:
                 # Re-calculate the actual count just to be safe
-                actual_strict_count = db.query(models.Appointment).filter(
-                    models.Appointment.slot_id == issue["slot_id"],
-                    models.Appointment.booking_type == models.BookingType.strict,
-                    models.Appointment.status != models.AppointmentStatus.cancelled
-                ).count()
+                actual_strict_count = db.execute(
+                    select(func.count()).select_from(models.Appointment).where(
+                        models.Appointment.slot_id == issue["slot_id"],
+                        models.Appointment.booking_type == models.BookingType.strict,
+                        models.Appointment.status != models.AppointmentStatus.cancelled
+                    )
+                ).scalar_one()
                 
                 slot = db.query(models.AppointmentSlot).filter(models.AppointmentSlot.id == issue["slot_id"]).with_for_update().first()
                 
@@ -2003,7 +2553,23 @@ def fix_consistency_issues(db: Session) -> schemas.ConsistencyFixReport:
 # ==================== SYSTEM CONFIGURATION HELPERS ====================
 
 def get_system_config(db: Session, key: str) -> Optional[models.SystemConfiguration]:
-    return db.query(models.SystemConfiguration).filter(models.SystemConfiguration.key == key).first()
+    return db.execute(_STMT_SYSTEM_CONFIG_BY_KEY, {"key": key}).scalars().first()
+
+def get_system_config_value(db: Session, key: str, default: Any = None) -> Any:
+    """Read a config value through a process-local TTL cache; for readers that only need .value."""
+    cached = _system_config_cache.get(key, _CONFIG_MISSING)
+    if cached is _CONFIG_MISSING:
+        entry = get_system_config(db, key)
+        cached = entry.value if entry else None
+        _system_config_cache.set(key, cached)
+    return default if cached is None else cached
+
+def invalidate_system_config(key: Optional[str] = None) -> None:
+    """Drop one cached config value, or all of them."""
+    if key is None:
+        _system_config_cache.clear()
+    else:
+        _system_config_cache.pop(key)
 
 def set_system_config(
     db: Session,
@@ -2032,4 +2598,5 @@ def set_system_config(
             entry.category = category
     db.commit()
     db.refresh(entry)
+    invalidate_system_config(key)
     return entry
@@ -4,18 +4,50 @@ from sqlalchemy import text
 from sqlalchemy import inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from .config import get_settings
 
 # Create engine
+settings = get_settings()
+pool_options = {}
+if not settings.database_url.startswith("sqlite"):
+    # Keep enough warm connections per worker that checkout never has to open a new one mid-request
+    pool_options = {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_recycle": settings.database_pool_recycle,
+        # TCP keepalives so connections dropped by a DB restart or idle firewall are
+        # detected by the OS instead of stalling the first query on them
+        "connect_args": {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 5},
+    }
+
 engine = create_engine(
-    get_settings().database_url,
+    settings.database_url,
     pool_pre_ping=True,
-    echo=False
+    query_cache_size=1200,  # Cover ad-hoc queries as well as the prebuilt CRUD statements
+    echo=False,
+    **pool_options
 )
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the handlers that await other I/O (calendar lookups) between queries,
+# so DB round trips yield to the event loop instead of blocking it
+def _async_database_url(url: str) -> str:
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return "postgresql+asyncpg://" + url.split("://", 1)[1]
+
+async_pool_options = {k: v for k, v in pool_options.items() if k != "connect_args"}  # keepalive args are psycopg2-only
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url),
+    pool_pre_ping=True,
+    echo=False,
+    **async_pool_options
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -27,6 +59,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_tables():
     """Create all database tables - MUST import models first!"""
     # Import models to register them with Base.metadata
@@ -9,6 +9,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse, JSONResponse, FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
+from apscheduler.schedulers.background import BackgroundScheduler
 
 # Import our modules
 from app import models, schemas, crud
@@ -16,6 +17,7 @@ from app.database import get_db, create_tables, drop_tables # Explicitly import
 from app.hash_password import create_or_update_admin, create_initial_data
 from app.routers import auth, patients, appointments, schedule, unavailable_periods, locations, users, prescriptions, logs, services, consultations, slots, health, templates
 from app.services.whatsapp_service import whatsapp_service # Import the WhatsApp service instance
+from app.compliance_logger import compliance_logger
 # --- Logging Configuration --- START ---
 # Configure root logger to output DEBUG messages to console
 logging.basicConfig(level=logging.DEBUG,
@@ -42,6 +44,28 @@ def on_startup():
     create_initial_data()
     create_or_update_admin()
 
+# Audit log writes are batched by a background task instead of committing inside each request
+@app.on_event("startup")
+async def start_audit_writer():
+    await compliance_logger.start()
+
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    await compliance_logger.stop()
+
+# Dashboard counts are served from mv_dashboard_stats, refreshed in the background every minute.
+# Each worker runs this scheduler, but refresh_dashboard_stats_view lets only one of them refresh.
+dashboard_scheduler = BackgroundScheduler()
+
+@app.on_event("startup")
+def start_dashboard_refresh():
+    dashboard_scheduler.add_job(crud.refresh_dashboard_stats_view, "interval", seconds=60, id="refresh_dashboard_stats", replace_existing=True)
+    dashboard_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_dashboard_refresh():
+    dashboard_scheduler.shutdown(wait=False)
+
 app.add_middleware(
     CORSMiddleware,
     # REFACTORED: Be explicit about the front-end origin (http://127.0.0.1:5501) and localhost for robust local development.
@@ -131,7 +155,12 @@ async def token_redirect():
 
 # ==================== DASHBOARD & OTHER ENDPOINTS (RESTORED) ====================
 @app.get("/api/v1/dashboard/stats", response_model=schemas.DashboardStatsResponse, tags=["Dashboard"])
-async def get_dashboard_stats(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return crud.get_dashboard_stats(db)
+async def get_dashboard_stats(location_id: Optional[int] = None, accurate: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Dashboard counts from a view refreshed every minute, so up to 60 s stale; pass accurate=true for live counts."""
+    return crud.get_dashboard_stats(db, location_id=location_id, accurate=accurate)
+
+@app.get("/api/v1/dashboard/has-pending", tags=["Dashboard"])
+async def get_dashboard_has_pending(location_id: Optional[int] = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return {"has_pending": crud.has_pending_appointments(db, location_id=location_id)}
 
 app.mount("/", StaticFiles(directory="static", html = True), name="static")
\ No newline at end of file
@@ -3,13 +3,40 @@ from datetime import datetime, time
 from sqlalchemy import (
     Column, Integer, String, DateTime, Time, ForeignKey, Text, Date,
     Enum as SQLAlchemyEnum, Boolean, LargeBinary, JSON, Numeric, Index,
-    UniqueConstraint  # <-- Import added here
+    UniqueConstraint,  # <-- Import added here
+    text, column
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.orm import relationship, Session, with_loader_criteria
 from sqlalchemy.sql import func
 from .database import Base
 import enum
 
+
+# Soft delete support
+class SoftDeletable:
+    """Mixin for models that are soft-deleted by stamping deleted_at."""
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _exclude_soft_deleted(execute_state):
+    """Hide soft-deleted rows from ORM SELECTs unless execution_options(include_deleted=True) is set."""
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeletable,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True
+            )
+        )
+
 # Enhanced Enum Classes for better type safety
 class UserRole(str, enum.Enum):
     admin = "admin"
@@ -128,8 +155,9 @@ class DocumentType(str, enum.Enum):
     other = "other"
 
 # User Management Models
-class User(Base):
+class User(SoftDeletable, Base):
     """Enhanced User model with comprehensive security features"""
+    __mapper_args__ = {"eager_defaults": True}  # Server defaults come back via INSERT/UPDATE ... RETURNING
     __tablename__ = "users"
     __table_args__ = (
         Index('idx_users_username', 'username'),
@@ -154,8 +182,8 @@ class User(Base):
     # Enhanced security fields
     mfa_secret = Column(String(32), nullable=True)
     mfa_backup_codes = Column(JSON, nullable=True)
-    mfa_enabled = Column(Boolean, default=False)
-    failed_login_attempts = Column(Integer, default=0)
+    mfa_enabled = Column(Boolean, default=False, nullable=False, server_default=text('false'))
+    failed_login_attempts = Column(Integer, default=0, nullable=False, server_default=text('0'))
     account_locked_until = Column(DateTime(timezone=True), nullable=True)
     password_last_changed = Column(DateTime(timezone=True), nullable=True)
     must_change_password = Column(Boolean, default=False)
@@ -166,15 +194,14 @@ class User(Base):
     current_session_id = Column(String(255), nullable=True)
     
     # Account status and permissions
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, nullable=False, server_default=text('true'))
     is_verified = Column(Boolean, default=False)
-    permissions = Column(JSON, nullable=True)  # Custom permissions per user
+    permissions = Column(JSON, nullable=False, server_default=text("'{}'"))  # Custom permissions per user
     is_super_admin = Column(Boolean, default=False)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
 
 
 # Enum for AppointmentSlot status
@@ -394,6 +421,7 @@ class Location(Base):
 
 class Patient(Base):
     """HIPAA-compliant Patient model with encryption"""
+    __mapper_args__ = {"eager_defaults": True}  # Server defaults come back via INSERT/UPDATE ... RETURNING
     __tablename__ = "patients"
     __table_args__ = (
         Index('idx_patients_phone_hash', 'phone_hash'),
@@ -471,9 +499,21 @@ class Patient(Base):
     consultations = relationship("Consultation", back_populates="patient", cascade="all, delete-orphan")
     menstrual_history = relationship("PatientMenstrualHistory", back_populates="patient", uselist=False, cascade="all, delete-orphan")
     history = relationship("PatientHistory", back_populates="patient", uselist=False, cascade="all, delete-orphan")
+    name_tokens = relationship("PatientNameToken", back_populates="patient", cascade="all, delete-orphan")
+
+class PatientNameToken(Base):
+    """Lookup hash of one word of a patient's name, for word-level search over encrypted names"""
+    __tablename__ = "patient_name_tokens"
+
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), primary_key=True)
+    token_hash = Column(String(64), primary_key=True, index=True)
+
+    patient = relationship("Patient", back_populates="name_tokens")
+
 
 class Appointment(Base):
     """Comprehensive Appointment model with calendar integration"""
+    __mapper_args__ = {"eager_defaults": True}  # Server defaults come back via INSERT/UPDATE ... RETURNING
     __tablename__ = "appointments"
     __table_args__ = (
         Index('idx_appointments_patient_date', 'patient_id', 'start_time'),
@@ -481,6 +521,18 @@ class Appointment(Base):
         Index('idx_appointments_user_date', 'user_id', 'start_time'),
         Index('idx_appointments_status_date', 'status', 'start_time'),
         Index('idx_appointments_date_range', 'start_time', 'end_time'),
+        # Conflict/availability probes only ever look at live appointments
+        Index('idx_appointments_location_time_active', 'location_id', 'start_time', 'end_time',
+              postgresql_where=text("status != 'cancelled'")),
+        # Two appointments that occupy the chair at one location can never overlap (needs btree_gist).
+        # Finished or abandoned states (completed, no_show, rescheduled, cancelled) are left out.
+        ExcludeConstraint(
+            (column('location_id'), '='),
+            (func.tstzrange(column('start_time'), column('end_time')), '&&'),
+            name='excl_appointments_location_time',
+            using='gist',
+            where=text("status IN ('scheduled', 'confirmed', 'checked_in', 'in_progress')"),
+        ).ddl_if(dialect='postgresql'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -810,6 +862,7 @@ class UnavailablePeriod(Base):
     __table_args__ = (
         Index('idx_unavailable_location_date', 'location_id', 'start_datetime'),
         Index('idx_unavailable_date_range', 'start_datetime', 'end_datetime'),
+        Index('idx_unavailable_location_range', 'location_id', 'start_datetime', 'end_datetime'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -851,6 +904,9 @@ class AuditLog(Base):
         Index('idx_audit_action_date', 'action', 'timestamp'),
         Index('idx_audit_resource', 'resource_type', 'resource_id'),
         Index('idx_audit_ip_date', 'ip_address', 'timestamp'),
+        Index('idx_audit_timestamp_id', 'timestamp', 'id'),  # Keyset pagination (scanned backwards for DESC)
+        Index('idx_audit_category_date', 'category', 'timestamp'),
+        Index('idx_audit_severity_date', 'severity', 'timestamp'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
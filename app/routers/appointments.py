@@ -3,6 +3,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, status
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import datetime, date, timezone # Added timezone
@@ -131,6 +132,12 @@ async def create_new_appointment(
     except HTTPException as http_exc:
         db.rollback() # Rollback on known errors (slot full, blocked, etc.)
         raise http_exc # Re-raise the HTTP exception
+    except crud.AppointmentConflictError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except crud.CRUDError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         db.rollback() # Rollback on any other error
         print(f"ERROR during transactional appointment creation: {e}")
@@ -158,12 +165,6 @@ def read_appointments(
     return crud.get_appointments_by_date_range(db, start_date=start_datetime, end_date=end_datetime, location_id=location_id)
 
 @router.put("/appointments/{appointment_id}", response_model=schemas.AppointmentResponse)
-# --- REFACTORED: Add db_appointment parameter to crud.delete_appointment ---
-# We also need to update crud.py to accept this.
-# This avoids a second DB lookup in the crud function.
-async def _helper_patch_crud_delete_appointment():
-    pass # This is a placeholder, will edit crud.py next.
-
 async def update_appointment_endpoint(
     appointment_id: int,
     appointment_update: schemas.AppointmentUpdate,
@@ -172,7 +173,12 @@ async def update_appointment_endpoint(
     current_user: models.User = Depends(security.get_current_user)
 ):
     """Update an appointment and sync changes to Google Calendar."""
-    db_appointment = await crud.update_appointment(db=db, appointment_id=appointment_id, appointment_update=appointment_update)
+    try:
+        db_appointment = await crud.update_appointment(db=db, appointment_id=appointment_id, appointment_update=appointment_update)
+    except crud.AppointmentConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except crud.CRUDError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if db_appointment is None:
         raise HTTPException(status_code=404, detail="🔍 **Not Found:** The requested appointment could not be found.")
     
@@ -213,13 +219,16 @@ async def delete_appointment_endpoint(
                 slot_updated = False
 
                 # Step 3a: Check for other active appointments on this slot
-                other_active_appointments_count = db.query(models.Appointment).filter(
-                    models.Appointment.slot_id == target_slot.id,
-                    models.Appointment.id != appointment_id, # Exclude the one we are about to delete
-                    models.Appointment.status != models.AppointmentStatus.cancelled
-                ).count()
+                # Only "any left?" matters, so stop at the first match instead of counting
+                has_other_active_appointments = db.query(
+                    select(models.Appointment.id).where(
+                        models.Appointment.slot_id == target_slot.id,
+                        models.Appointment.id != appointment_id, # Exclude the one we are about to delete
+                        models.Appointment.status != models.AppointmentStatus.cancelled
+                    ).exists()
+                ).scalar()
 
-                print(f"DELETION CHECK: Found {other_active_appointments_count} other active appointments for slot {target_slot.id}.")
+                print(f"DELETION CHECK: Other active appointments for slot {target_slot.id}: {has_other_active_appointments}.")
 
                 # Step 3b: Update strict counter if necessary
                 if db_appointment.booking_type == BookingType.strict:
@@ -228,7 +237,7 @@ async def delete_appointment_endpoint(
                     print(f"STRICT DELETION: Slot {target_slot.id} strict count decremented to {target_slot.current_strict_appointments}.")
 
                 # Step 3c: Update slot status only if this was the LAST appointment
-                if other_active_appointments_count == 0 and target_slot.status == SlotStatus.booked:
+                if not has_other_active_appointments and target_slot.status == SlotStatus.booked:
                     target_slot.status = SlotStatus.available
                     # Reset counter to 0 if it's now available, just in case
                     target_slot.current_strict_appointments = 0 
@@ -276,7 +285,12 @@ async def update_appointment_status_endpoint(
     current_user: models.User = Depends(security.get_current_user)
 ):
     """Update an appointment's status and sync to Google Calendar."""
-    db_appointment = await crud.update_appointment(db=db, appointment_id=appointment_id, appointment_update=status_update)
+    try:
+        db_appointment = await crud.update_appointment(db=db, appointment_id=appointment_id, appointment_update=status_update)
+    except crud.AppointmentConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except crud.CRUDError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if db_appointment is None:
         raise HTTPException(status_code=404, detail="🔍 **Not Found:** The requested appointment could not be found.")
     
@@ -5,7 +5,7 @@ from typing import List, Dict, Any
 from datetime import datetime, timezone
 
 from .. import crud, schemas, models, security
-from ..database import get_db
+from ..database import get_db, engine
 from ..models import UserRole
 
 router = APIRouter(
@@ -50,4 +50,12 @@ async def fix_system_anomalies(db: Session = Depends(get_db)):
     print(f"INFO: Consistency fix completed. Fixed {len(fix_report.fixed_slots)} slots and {len(fix_report.fixed_counters)} counters.")
     return fix_report
 
+@router.get("/db-pool", dependencies=[Depends(get_current_admin_user)])
+async def get_db_pool_status() -> Dict[str, Any]:
+    """
+    Reports the database connection pool usage.
+    Accessible only by admin users.
+    """
+    return {"status": engine.pool.status(), "checked_at": datetime.now(timezone.utc)}
+
 # Remember to include this router in app/main.py
\ No newline at end of file
@@ -1,9 +1,12 @@
 # app/routers/logs.py
 from datetime import datetime, timezone # Added datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
+import csv
+import io
 
 from .. import crud, schemas, models
 from ..models import AppointmentSlot # Import AppointmentSlot for resource type
@@ -18,6 +21,7 @@ router = APIRouter(
 
 @router.get("/logs", response_model=List[schemas.AuditLogResponse])
 def read_audit_logs(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     user_id: Optional[int] = None,
@@ -25,22 +29,66 @@ def read_audit_logs(
     severity: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    before_timestamp: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
     Retrieve audit logs with optional filtering. 
+    Pass before_timestamp/before_id from the last row of a page to fetch the next one.
+    The number of matching logs is returned in the X-Total-Count header.
     Only accessible by administrators.
     """
     try:
-        logs = crud.get_audit_logs(
+        logs, total = crud.get_audit_logs(
             db, skip=skip, limit=limit, user_id=user_id, category=category, 
-            severity=severity, start_date=start_date, end_date=end_date
+            severity=severity, start_date=start_date, end_date=end_date,
+            before_timestamp=before_timestamp, before_id=before_id
         )
+        response.headers["X-Total-Count"] = str(total)
         return logs
     except crud.CRUDError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/logs/export")
+def export_audit_logs(
+    user_id: Optional[int] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Export all matching audit logs as CSV.
+    Rows are streamed from the database in chunks, so memory use does not grow with the export size.
+    Only accessible by administrators.
+    """
+    columns = [
+        "id", "timestamp", "user_id", "username", "action", "category", "severity",
+        "resource_type", "resource_id", "details", "ip_address", "user_agent",
+    ]
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for log in crud.iter_audit_logs(
+            db, user_id=user_id, category=category,
+            severity=severity, start_date=start_date, end_date=end_date
+        ):
+            writer.writerow(log)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    return StreamingResponse(generate_csv(), media_type="text/csv", headers={
+        "Content-Disposition": "attachment; filename=audit_logs.csv"
+    })
+
+
 @router.get("/logs/comprehensive", response_model=List[schemas.ComprehensiveLogEntry])
 async def read_comprehensive_logs(
     skip: int = 0,
@@ -61,7 +109,7 @@ async def read_comprehensive_logs(
 
     try:
         # 1. Fetch standard audit logs
-        audit_logs_orm = crud.get_audit_logs(
+        audit_logs_orm, _ = crud.get_audit_logs(
             db, skip=0, limit=1000, # Fetch more initially for sorting, apply limit later
             user_id=user_id, category=category,
             severity=severity, start_date=start_date, end_date=end_date
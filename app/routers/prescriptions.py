@@ -123,8 +123,7 @@ def get_prescription_template(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(security.get_current_user)
 ):
-    entry = crud.get_system_config(db, "prescription_template_path")
-    return {"path": entry.value if entry else None}
+    return {"path": crud.get_system_config_value(db, "prescription_template_path")}
 
 
 @router.post("/editor/save")
@@ -329,15 +328,11 @@ def get_prescription_defaults(
     current_user: models.User = Depends(security.get_current_user)
 ):
     """Return stored editor defaults (header/footer/body/signature)."""
-    header = crud.get_system_config(db, "prescription_defaults_header")
-    footer = crud.get_system_config(db, "prescription_defaults_footer")
-    body = crud.get_system_config(db, "prescription_defaults_body")
-    signature = crud.get_system_config(db, "prescription_signature_url")
     return {
-        "header_html": header.value if header else "",
-        "footer_html": footer.value if footer else "",
-        "body_html": body.value if body else "",
-        "signature_url": signature.value if signature else ""
+        "header_html": crud.get_system_config_value(db, "prescription_defaults_header", ""),
+        "footer_html": crud.get_system_config_value(db, "prescription_defaults_footer", ""),
+        "body_html": crud.get_system_config_value(db, "prescription_defaults_body", ""),
+        "signature_url": crud.get_system_config_value(db, "prescription_signature_url", "")
     }
 
 
@@ -1,11 +1,12 @@
 # app/routers/schedule.py
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import date, time, timedelta # Added timedelta
 from ..services import slot_service # Import slot service
 from .. import crud, models, schemas
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..security import get_current_user
 from .. import crud
 
@@ -90,11 +91,9 @@ def update_schedules_for_location(
 @router.get("/config")
 def get_schedule_config(db: Session = Depends(get_db)):
     """Get global schedule configuration (limits and intervals)."""
-    interval = crud.get_system_config(db, "appointment_interval_minutes")
-    daily_limit = crud.get_system_config(db, "appointment_daily_limit")
     return {
-        "appointment_interval_minutes": (interval.value if interval else 15),
-        "appointment_daily_limit": (daily_limit.value if daily_limit else 2)
+        "appointment_interval_minutes": crud.get_system_config_value(db, "appointment_interval_minutes", 15),
+        "appointment_daily_limit": crud.get_system_config_value(db, "appointment_daily_limit", 2)
     }
 
 
@@ -197,7 +196,7 @@ def update_day_schedule(
 async def get_availability_for_date(
     location_id: int,
     for_date: date,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retrieve available appointment slots for a given location and date.
@@ -1,5 +1,6 @@
 # app/routers/slots.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 from datetime import date, datetime, time, timezone, timedelta
@@ -59,14 +60,16 @@ def get_available_slots(
                 return []
 
             # 4. Check if this day is blocked by an UnavailablePeriod (variables already defined in step 1)
-            is_blocked = db.query(models.UnavailablePeriod).filter(
-                models.UnavailablePeriod.location_id == location_id,
-                models.UnavailablePeriod.start_datetime < day_end_ist,
-                models.UnavailablePeriod.end_datetime > day_start_ist
-            ).first()
+            blocking_period_id = db.execute(
+                select(models.UnavailablePeriod.id).where(
+                    models.UnavailablePeriod.location_id == location_id,
+                    models.UnavailablePeriod.start_datetime < day_end_ist,
+                    models.UnavailablePeriod.end_datetime > day_start_ist
+                ).limit(1)
+            ).scalar()
 
-            if is_blocked:
-                print(f"Date {target_date} is blocked by unavailable period {is_blocked.id}. Returning empty list.")
+            if blocking_period_id is not None:
+                print(f"Date {target_date} is blocked by unavailable period {blocking_period_id}. Returning empty list.")
                 return []
 
             # 5. Generate, save, and return the new slots
@@ -155,14 +158,16 @@ def emergency_block_slots(
 
         # 3. Create a corresponding UnavailablePeriod to block the calendar
         # Check if one already exists for this exact time/reason to avoid duplicates (using IST)
-        existing_period = db.query(models.UnavailablePeriod).filter(
-            models.UnavailablePeriod.location_id == location_id,
-            models.UnavailablePeriod.start_datetime == start_of_day_ist,
-            models.UnavailablePeriod.end_datetime == end_of_day_ist,
-            models.UnavailablePeriod.reason_type == "emergency"
-        ).first()
+        period_exists = db.query(
+            select(models.UnavailablePeriod.id).where(
+                models.UnavailablePeriod.location_id == location_id,
+                models.UnavailablePeriod.start_datetime == start_of_day_ist,
+                models.UnavailablePeriod.end_datetime == end_of_day_ist,
+                models.UnavailablePeriod.reason_type == "emergency"
+            ).exists()
+        ).scalar()
 
-        if not existing_period:
+        if not period_exists:
             unavailable_period_schema = schemas.UnavailablePeriodCreate(
                 location_id=location_id,
                 start_datetime=start_of_day_ist,
@@ -18,11 +18,12 @@ def create_new_user(
     db: Session = Depends(get_db),
     current_admin: models.User = Depends(security.require_admin)
 ):
-    db_user = crud.get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    new_user = crud.create_user(db=db, user=user)
+    # No lookup first: the unique indexes reject duplicates atomically and create_user
+    # maps the violation to a "Username/Email already exists" CRUDError
+    try:
+        new_user = crud.create_user(db=db, user=user)
+    except crud.CRUDError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     crud.create_audit_log(
         db=db, user_id=current_admin.id, action="CREATE", category="USER",
         resource_id=new_user.id, details=f"Created new user: {new_user.username} with role {new_user.role.value}",
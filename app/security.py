@@ -2,6 +2,8 @@
 import os
 import secrets
 import hashlib
+import hmac
+import time
 import pyotp
 import qrcode
 from io import BytesIO
@@ -23,6 +25,7 @@ from ipaddress import ip_address, ip_network
 from .database import get_db
 from . import models, crud
 from app.compliance_logger import compliance_logger
+from app.core.cache import TTLCache
 
 
 # Configure logging for security events
@@ -38,6 +41,12 @@ pwd_context = CryptContext(
     argon2__parallelism=1,
 )
 
+# Recent successful verifications, so bursts of re-authentication skip the Argon2 work.
+# Keys are HMACs under a per-process random key, so neither the plaintext nor a cheap
+# hash of it is ever held in memory. Keyed on the stored hash too: a password change misses.
+_verify_cache = TTLCache(maxsize=1024, ttl=30)
+_VERIFY_CACHE_KEY = secrets.token_bytes(32)
+
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
@@ -124,6 +133,14 @@ class EncryptionService:
             return b""
         return self.fernet.encrypt(data.encode())
 
+    def encrypt_many(self, values: List[Optional[str]]) -> List[Optional[bytes]]:
+        """Encrypt several fields with one Fernet instance and timestamp; None stays None"""
+        now = int(time.time())
+        return [
+            None if value is None else (self.fernet.encrypt_at_time(value.encode(), now) if value else b"")
+            for value in values
+        ]
+
     def decrypt(self, encrypted_data: bytes) -> str:
         """Decrypt sensitive data"""
         if not encrypted_data:
@@ -387,8 +404,17 @@ mfa_service = MFAService()
 # Password utilities
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
+    cache_key = hmac.new(
+        _VERIFY_CACHE_KEY, f"{hashed_password}\0{plain_password}".encode(), hashlib.sha256
+    ).digest()
+    if _verify_cache.get(cache_key):
+        return True
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        verified = pwd_context.verify(plain_password, hashed_password)
+        if verified:
+            # Only successes are cached so wrong guesses always pay the full hashing cost
+            _verify_cache.set(cache_key, True)
+        return verified
     except Exception:
         # Unknown/legacy hash formats should not crash login; treat as non-match
         return False
@@ -14,10 +14,16 @@ import logging
 from sqlalchemy.orm import Session
 
 from ..config import get_settings
+from ..core.cache import TTLCache
 from .. import models, schemas, crud
 
 logger = logging.getLogger(__name__)
 
+# Free/busy results per (start, end, calendar) shared by concurrent availability checks.
+# Kept short: our own appointments come from the database, this only covers outside events.
+_busy_times_cache = TTLCache(maxsize=256, ttl=60)
+_busy_times_inflight: Dict[tuple, "asyncio.Future"] = {}
+
 class GoogleCalendarService:
     """Google Calendar integration for appointment scheduling and availability"""
 
@@ -323,7 +329,8 @@ Notes: {appointment_notes}"""
                 'items': [{'id': calendar_id}]
             }
 
-            freebusy_query = self.service.freebusy().query(body=body).execute()
+            # Run the blocking HTTP call off the event loop so callers can overlap it with other work
+            freebusy_query = await asyncio.to_thread(self.service.freebusy().query(body=body).execute)
             busy_times = []
 
             for calendar_info in freebusy_query.get('calendars', {}).values():
@@ -436,11 +443,12 @@ Notes: {appointment_notes}"""
         try:
             # Get appointments without Google Calendar event IDs
             appointments = crud.get_appointments_without_calendar_events(db)
+            created_events = []
 
             for appointment in appointments:
                 try:
-                    patient = crud.get_patient(db, appointment.patient_id)
-                    location = crud.get_location(db, appointment.location_id)
+                    # Loaded with the appointments in the same query
+                    patient, location = appointment.patient, appointment.location
 
                     if not patient or not location:
                         stats["skipped"] += 1
@@ -450,8 +458,8 @@ Notes: {appointment_notes}"""
                     event_id = await self.create_calendar_event(appointment, patient, location)
 
                     if event_id:
-                        # Update appointment with event ID
-                        crud.update_appointment_calendar_event(db, appointment.id, event_id)
+                        # Event IDs are written back in bulk once the loop is done
+                        created_events.append((appointment.id, event_id))
                         stats["success"] += 1
                     else:
                         stats["failed"] += 1
@@ -460,6 +468,7 @@ Notes: {appointment_notes}"""
                     logger.error(f"Failed to sync appointment {appointment.id}: {str(e)}")
                     stats["failed"] += 1
 
+            crud.update_appointment_calendar_events_bulk(db, created_events)
             logger.info(f"Calendar sync completed: {stats}")
             return stats
 
@@ -467,6 +476,24 @@ Notes: {appointment_notes}"""
             logger.error(f"Calendar sync failed: {str(e)}")
             return stats
 
+    async def get_busy_times_cached(self, start_date: datetime, end_date: datetime,
+                                    calendar_id: str = 'primary') -> List[Dict[str, datetime]]:
+        """get_busy_times through a short TTL cache; concurrent misses for the same range share one API call"""
+        key = (start_date.isoformat(), end_date.isoformat(), calendar_id)
+        busy_times = _busy_times_cache.get(key)
+        if busy_times is not None:
+            return busy_times
+
+        task = _busy_times_inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.get_busy_times(start_date, end_date, calendar_id))
+            _busy_times_inflight[key] = task
+            task.add_done_callback(lambda _: _busy_times_inflight.pop(key, None))
+        # shield: one waiter being cancelled must not cancel the call the others are waiting on
+        busy_times = await asyncio.shield(task)
+        _busy_times_cache.set(key, busy_times)
+        return busy_times
+
     def get_service_status(self) -> Dict[str, Any]:
         """Get Google Calendar service status"""
         status = {
@@ -489,3 +516,13 @@ Notes: {appointment_notes}"""
             status["status"] = "disabled"
 
         return status
+
+
+_calendar_service: Optional[GoogleCalendarService] = None
+
+def get_calendar_service() -> GoogleCalendarService:
+    """Process-wide GoogleCalendarService; building the API client per call is expensive"""
+    global _calendar_service
+    if _calendar_service is None:
+        _calendar_service = GoogleCalendarService()
+    return _calendar_service
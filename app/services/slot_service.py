@@ -1,5 +1,6 @@
 # app/services/slot_service.py
 # FINAL IST-ONLY VERSION
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import date, datetime, time, timedelta, timezone
 from typing import List, Optional
@@ -52,12 +53,14 @@ def generate_slots_for_schedule_day(db: Session, schedule: models.LocationSchedu
             print(f"Slot ending at {slot_end_dt_ist} exceeds schedule end time {end_dt_loop}. Stopping generation.")
             break
 
-        existing_slot = db.query(models.AppointmentSlot).filter(
-            models.AppointmentSlot.location_id == schedule.location_id,
-            models.AppointmentSlot.start_time == current_dt_loop  # Compare using IST
-        ).first()
+        existing_slot_id = db.execute(
+            select(models.AppointmentSlot.id).where(
+                models.AppointmentSlot.location_id == schedule.location_id,
+                models.AppointmentSlot.start_time == current_dt_loop  # Compare using IST
+            ).limit(1)
+        ).scalar()
 
-        if existing_slot:
+        if existing_slot_id is not None:
             print(f"Slot already exists for {schedule.location_id} at {current_dt_loop}. Skipping.")
         else:
             slot_capacity = schedule.max_appointments if schedule.max_appointments and schedule.max_appointments > 0 else 1
@@ -127,11 +130,25 @@ def regenerate_slots_for_location(db: Session, location_id: int, start_date: dat
     range_start_ist = datetime.combine(start_date, time.min).replace(tzinfo=IST)
     range_end_ist = datetime.combine(end_date, time.max).replace(tzinfo=IST)
 
-    unavailable_periods = db.query(models.UnavailablePeriod).filter(
-        models.UnavailablePeriod.location_id == location_id,
-        models.UnavailablePeriod.start_datetime <= range_end_ist,  # Compare using IST
-        models.UnavailablePeriod.end_datetime >= range_start_ist  # Compare using IST
+    # Only the two datetimes are needed, so fetch plain rows instead of ORM objects
+    unavailable_periods = db.execute(
+        select(models.UnavailablePeriod.start_datetime, models.UnavailablePeriod.end_datetime).where(
+            models.UnavailablePeriod.location_id == location_id,
+            models.UnavailablePeriod.start_datetime <= range_end_ist,  # Compare using IST
+            models.UnavailablePeriod.end_datetime >= range_start_ist  # Compare using IST
+        )
     ).all()
+    # Normalise to IST once and sort by start; days are visited in order, so a moving
+    # pointer plus the latest end seen so far answers "is this day blocked" in O(1) amortised
+    unavailable_periods = sorted(
+        (
+            period_start if period_start.tzinfo else period_start.replace(tzinfo=IST),  # Assume IST if naive
+            period_end if period_end.tzinfo else period_end.replace(tzinfo=IST),
+        )
+        for period_start, period_end in unavailable_periods
+    )
+    period_index = 0
+    latest_period_end = None
 
     current_date = start_date
     total_created = 0
@@ -145,17 +162,13 @@ def regenerate_slots_for_location(db: Session, location_id: int, start_date: dat
             # --- FINAL FIX: Use IST for daily range checks ---
             day_start_ist = datetime.combine(current_date, time.min).replace(tzinfo=IST)
             day_end_ist = datetime.combine(current_date, time.max).replace(tzinfo=IST)
-            is_blocked = False
-            for period in unavailable_periods:
-                # Ensure period times are timezone-aware before comparison if necessary
-                period_start = period.start_datetime
-                period_end = period.end_datetime
-                if period_start.tzinfo is None: period_start = period_start.replace(tzinfo=IST)  # Assume IST if naive
-                if period_end.tzinfo is None: period_end = period_end.replace(tzinfo=IST)  # Assume IST if naive
-
-                if period_start < day_end_ist and period_end > day_start_ist:
-                    is_blocked = True
-                    break
+            while period_index < len(unavailable_periods) and unavailable_periods[period_index][0] < day_end_ist:
+                period_end = unavailable_periods[period_index][1]
+                if latest_period_end is None or period_end > latest_period_end:
+                    latest_period_end = period_end
+                period_index += 1
+            # Every period admitted so far starts before this day ends; it overlaps if it ends after the day starts
+            is_blocked = latest_period_end is not None and latest_period_end > day_start_ist
 
             # --- FINAL FIX: Use IST for fetching existing slots ---
             existing_slots_for_day = db.query(models.AppointmentSlot).filter(
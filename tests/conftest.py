@@ -0,0 +1,76 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+import pytest_asyncio
+
+# Settings are read when app modules are imported, so point them at a throwaway SQLite file first
+_SQLITE_URL = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("DATABASE_URL", _SQLITE_URL)
+os.environ.setdefault("SECRET_KEY", "test-secret-key-" + "x" * 32)
+os.environ.setdefault("ENCRYPTION_KEY", "test-encryption-key-" + "x" * 32)
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app import crud, models
+from app.database import Base, _async_database_url
+
+# The Postgres variants run only when TEST_POSTGRES_URL points at a disposable database
+_BACKEND_URLS = {
+    "sqlite": _SQLITE_URL,
+    "postgresql": os.getenv("TEST_POSTGRES_URL"),
+}
+
+_TABLES = [
+    models.User.__table__,
+    models.Location.__table__,
+    models.Patient.__table__,
+    models.PatientNameToken.__table__,
+    models.AppointmentSlot.__table__,
+    models.Appointment.__table__,
+    models.UnavailablePeriod.__table__,
+    models.LocationSchedule.__table__,
+    models.AuditLog.__table__,
+]
+
+
+class _CalendarDisabled:
+    enabled = False
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def engine(request, monkeypatch):
+    """A sync engine on each backend with the scheduling and audit tables created, dropped afterwards."""
+    url = _BACKEND_URLS[request.param]
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+    Base.metadata.create_all(engine, tables=_TABLES)
+    crud._schedule_cache.clear()
+    # Keep Google Calendar and any local Redis (availability caches) out of the picture
+    monkeypatch.setattr("app.services.calendar_service.get_calendar_service", lambda: _CalendarDisabled())
+    monkeypatch.setattr(crud, "redis_client", None)
+    yield engine
+    Base.metadata.drop_all(engine, tables=_TABLES)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest_asyncio.fixture
+async def async_db(engine):
+    async_engine = create_async_engine(_async_database_url(engine.url.render_as_string(hide_password=False)))
+    async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+        yield session
+    await async_engine.dispose()
@@ -0,0 +1,42 @@
+# tests/test_appointment_overlap.py
+from datetime import date, datetime, time
+
+import pytest
+
+from app import crud, models, schemas
+
+MONDAY = date(2030, 1, 7)
+
+
+def _booking(location_id, patient_id, start, end):
+    return schemas.AppointmentCreate(
+        patient_id=patient_id, location_id=location_id,
+        start_time=datetime.combine(MONDAY, start), end_time=datetime.combine(MONDAY, end),
+    )
+
+
+@pytest.mark.asyncio
+async def test_overlapping_live_appointment_is_a_conflict(db):
+    if db.bind.dialect.name != "postgresql":
+        pytest.skip("the no-overlap exclusion constraint exists only on Postgres")
+    location = models.Location(name="Clinic")
+    patient = models.Patient(name_encrypted=b"x", name_hash="h")
+    db.add_all([location, patient])
+    db.commit()
+
+    await crud.create_appointment(
+        db, _booking(location.id, patient.id, time(10, 0), time(10, 30)),
+        user_id=None, slot_id=None, booking_type=models.BookingType.strict,
+    )
+    with pytest.raises(crud.AppointmentConflictError):
+        await crud.create_appointment(
+            db, _booking(location.id, patient.id, time(10, 15), time(10, 45)),
+            user_id=None, slot_id=None, booking_type=models.BookingType.walk_in,
+        )
+
+    # Back-to-back bookings share only an endpoint and are allowed
+    back_to_back = await crud.create_appointment(
+        db, _booking(location.id, patient.id, time(10, 30), time(11, 0)),
+        user_id=None, slot_id=None, booking_type=models.BookingType.strict,
+    )
+    assert back_to_back.id is not None
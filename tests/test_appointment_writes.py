@@ -0,0 +1,93 @@
+# tests/test_appointment_writes.py
+from contextlib import contextmanager
+from datetime import date, datetime, time
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, models, schemas
+from app.security import encryption_service
+
+MONDAY = date(2030, 1, 7)
+
+
+@contextmanager
+def _statements(engine):
+    """Collect the SQL sent to the database while the block runs."""
+    seen = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement.lstrip().upper())
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+class _FakeWhatsApp:
+    enabled = True
+    sent = []
+
+    async def send_message(self, number, message):
+        self.sent.append(number)
+
+
+def _seed_day(db, count):
+    """Two locations (emergency cancel blocks ids 1 and 2) and `count` appointments, each with its own patient."""
+    locations = [models.Location(name="Clinic A"), models.Location(name="Clinic B")]
+    patients = [
+        models.Patient(
+            name_encrypted=encryption_service.encrypt(f"Patient {i}"), name_hash=f"h{i}",
+            whatsapp_number=f"+9100000000{i}",
+        )
+        for i in range(count)
+    ]
+    db.add_all(locations + patients)
+    db.flush()
+    db.add_all([
+        models.Appointment(
+            patient_id=patient.id, location_id=locations[i % 2].id, duration_minutes=15,
+            start_time=datetime.combine(MONDAY, time(9 + i, 0)),
+            end_time=datetime.combine(MONDAY, time(9 + i, 15)),
+            status=models.AppointmentStatus.scheduled,
+        )
+        for i, patient in enumerate(patients)
+    ])
+    db.commit()
+    db.expunge_all()
+
+
+@pytest.mark.asyncio
+async def test_emergency_cancel_loads_patients_once_and_keeps_them_after_commit(db, engine, monkeypatch):
+    _FakeWhatsApp.sent = []
+    monkeypatch.setattr("app.services.whatsapp_service.WhatsAppService", _FakeWhatsApp)
+    _seed_day(db, 5)
+
+    with _statements(engine) as seen:
+        cancelled = await crud.emergency_cancel_appointments(db, MONDAY, "flood", user_id=None)
+        # What the router serializes must not refresh anything either
+        snapshot = [(a.id, a.location_id, a.status, a.patient.whatsapp_number) for a in cancelled]
+
+    # One SELECT for the appointments and one SELECT ... IN for their patients, however many rows
+    assert sum(s.startswith("SELECT") for s in seen) == 2
+    assert len(snapshot) == 5
+    assert all(status == models.AppointmentStatus.cancelled for _, _, status, _ in snapshot)
+    assert sorted(_FakeWhatsApp.sent) == sorted(number for *_, number in snapshot)
+
+
+@pytest.mark.asyncio
+async def test_update_appointment_result_stays_loaded_after_commit(db, engine):
+    _seed_day(db, 1)
+    appointment_id = db.query(models.Appointment.id).scalar()
+
+    updated = await crud.update_appointment(
+        db, appointment_id, schemas.AppointmentUpdate(status=models.AppointmentStatus.confirmed)
+    )
+    with _statements(engine) as seen:
+        assert updated.status == models.AppointmentStatus.confirmed
+        assert (updated.location_id, updated.start_time.time()) == (1, time(9, 0))
+        assert updated.patient.whatsapp_number == "+91000000000"
+
+    assert seen == []
@@ -0,0 +1,68 @@
+# tests/test_audit_logs.py
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+from app import crud, models
+
+START = datetime(2030, 1, 7, 9, 0, tzinfo=timezone.utc)
+
+
+def _seed_logs(db, count, category="SLOTS"):
+    db.execute(insert(models.AuditLog), [
+        {
+            "username": "System", "action": models.AuditAction.UPDATE, "category": category,
+            "severity": "INFO", "details": f"event {i}", "timestamp": START + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def test_cursor_pages_keep_the_filtered_total(db):
+    _seed_logs(db, 7)
+    _seed_logs(db, 2, category="GENERAL")
+
+    seen, totals = [], []
+    logs, total = crud.get_audit_logs(db, limit=3, category="SLOTS")
+    while logs:
+        seen.extend(log["details"] for log in logs)
+        totals.append(total)
+        last = logs[-1]
+        logs, total = crud.get_audit_logs(
+            db, limit=3, category="SLOTS", before_timestamp=last["timestamp"], before_id=last["id"]
+        )
+
+    # Newest first, every row exactly once, and the same total on every page
+    assert seen == [f"event {i}" for i in reversed(range(7))]
+    assert totals == [7, 7, 7]
+    # The empty page past the end still reports the filtered total
+    assert total == 7
+
+
+def test_offset_past_the_end_still_reports_the_total(db):
+    _seed_logs(db, 4)
+
+    logs, total = crud.get_audit_logs(db, skip=10, limit=3)
+
+    assert logs == []
+    assert total == 4
+
+
+def test_cursor_breaks_timestamp_ties_by_id(db):
+    db.execute(insert(models.AuditLog), [
+        {"username": "System", "action": models.AuditAction.UPDATE, "category": "SLOTS",
+         "details": f"tied {i}", "timestamp": START}
+        for i in range(5)
+    ])
+    db.commit()
+
+    ids = []
+    logs, _ = crud.get_audit_logs(db, limit=2)
+    while logs:
+        ids.extend(log["id"] for log in logs)
+        last = logs[-1]
+        logs, _ = crud.get_audit_logs(db, limit=2, before_timestamp=last["timestamp"], before_id=last["id"])
+
+    # Rows sharing a timestamp are neither skipped nor repeated across pages
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 5
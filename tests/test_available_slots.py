@@ -0,0 +1,86 @@
+# tests/test_available_slots.py
+from datetime import date, datetime, time
+
+import pytest
+
+from app import crud, models
+
+MONDAY = date(2030, 1, 7)
+
+
+def _seed(db):
+    """Working hours and blocks that are deliberately off the 15-minute grid."""
+    location = models.Location(name="Clinic")
+    patient = models.Patient(name_encrypted=b"x", name_hash="h")
+    db.add_all([location, patient])
+    db.flush()
+    db.add_all([
+        models.LocationSchedule(
+            location_id=location.id, day_of_week=MONDAY.weekday(),
+            start_time=time(9, 10), end_time=time(12, 0), is_available=True,
+        ),
+        models.Appointment(
+            patient_id=patient.id, location_id=location.id, duration_minutes=30,
+            start_time=datetime.combine(MONDAY, time(10, 5)),
+            end_time=datetime.combine(MONDAY, time(10, 35)),
+            status=models.AppointmentStatus.scheduled,
+        ),
+        models.UnavailablePeriod(
+            location_id=location.id,
+            start_datetime=datetime.combine(MONDAY, time(11, 20)),
+            end_datetime=datetime.combine(MONDAY, time(11, 25)),
+        ),
+    ])
+    db.commit()
+    return location.id
+
+
+@pytest.mark.asyncio
+async def test_unaligned_blocks_close_every_overlapping_slot(db, async_db):
+    location_id = _seed(db)
+
+    slots = await crud.get_available_slots(async_db, location_id, MONDAY)
+
+    # 09:00 starts before opening; 10:05-10:35 blocks 10:00-10:30; 11:20-11:25 blocks 11:15
+    assert slots == [
+        time(9, 15), time(9, 30), time(9, 45),
+        time(10, 45), time(11, 0),
+        time(11, 30), time(11, 45),
+    ]
+
+
+def _seed_hours(db, start, end, booked):
+    """A location open start-end on MONDAY with one appointment over the (start, end) pair `booked`."""
+    location = models.Location(name="Clinic")
+    patient = models.Patient(name_encrypted=b"x", name_hash="h")
+    db.add_all([location, patient])
+    db.flush()
+    db.add_all([
+        models.LocationSchedule(
+            location_id=location.id, day_of_week=MONDAY.weekday(),
+            start_time=start, end_time=end, is_available=True,
+        ),
+        models.Appointment(
+            patient_id=patient.id, location_id=location.id, duration_minutes=15,
+            start_time=datetime.combine(MONDAY, booked[0]), end_time=datetime.combine(MONDAY, booked[1]),
+            status=models.AppointmentStatus.scheduled,
+        ),
+    ])
+    db.commit()
+    return location.id
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("opening, first_slot", [(time(9, 0), time(9, 0)), (time(9, 10), time(9, 15))])
+async def test_detailed_slots_use_the_same_grid_as_available_slots(db, async_db, opening, first_slot):
+    location_id = _seed_hours(db, opening, time(10, 20), booked=(time(9, 15), time(9, 30)))
+
+    detailed = await crud._compute_available_slots_detailed(db, location_id, MONDAY)
+    available = await crud.get_available_slots(async_db, location_id, MONDAY)
+
+    # Only whole grid slots inside working hours: an off-grid opening rounds up, 10:15 would run past 10:20
+    assert [slot["time"] for slot in detailed] == [
+        t for t in (time(9, 0), time(9, 15), time(9, 30), time(9, 45), time(10, 0)) if t >= first_slot
+    ]
+    assert {slot["time"]: slot["reason"] for slot in detailed}[time(9, 15)] == "booked"
+    assert available == [slot["time"] for slot in detailed if slot["available"]]
@@ -0,0 +1,70 @@
+# tests/test_compliance_logger.py
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import compliance_logger as compliance_module, models
+from app.compliance_logger import ComplianceLogger
+
+
+@pytest.fixture
+def audit_logger(engine, monkeypatch):
+    """A fresh logger whose writes go to the test database, with small batches and a short window."""
+    monkeypatch.setattr(compliance_module, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(compliance_module, "AUDIT_BATCH_SIZE", 3)
+    monkeypatch.setattr(compliance_module, "AUDIT_BATCH_WINDOW_SECONDS", 0.05)
+    return ComplianceLogger()
+
+
+def _log(audit_logger, details):
+    audit_logger.log_event(user_id=None, role=None, action="CREATE", category="TEST", details=details)
+
+
+def _stored_details(db):
+    return sorted(d for (d,) in db.query(models.AuditLog.details))
+
+
+@pytest.mark.asyncio
+async def test_writer_stores_every_event_logged_before_stop(audit_logger, db, monkeypatch):
+    batches = []
+    insert_records = audit_logger._insert_records
+    monkeypatch.setattr(audit_logger, "_insert_records", lambda records: (batches.append(len(records)), insert_records(records)))
+
+    await audit_logger.start()
+    for i in range(7):
+        _log(audit_logger, f"loop {i}")
+    # Sync endpoints log from worker threads; those events are handed to the loop
+    await asyncio.to_thread(lambda: [_log(audit_logger, f"thread {i}") for i in range(4)])
+    await asyncio.sleep(0.2)  # Let the batch window expire at least once
+    for i in range(2):
+        _log(audit_logger, f"late {i}")
+    await audit_logger.stop()
+
+    expected = sorted([f"loop {i}" for i in range(7)] + [f"thread {i}" for i in range(4)] + [f"late {i}" for i in range(2)])
+    assert _stored_details(db) == expected
+    assert batches and max(batches) <= 3
+    assert audit_logger._writer_task is None
+
+
+@pytest.mark.asyncio
+async def test_events_after_stop_are_written_inline(audit_logger, db):
+    await audit_logger.start()
+    await audit_logger.stop()
+
+    _log(audit_logger, "after stop")
+    thread = threading.Thread(target=_log, args=(audit_logger, "from thread after stop"))
+    thread.start()
+    thread.join()
+
+    assert _stored_details(db) == ["after stop", "from thread after stop"]
+
+
+def test_bad_row_only_drops_itself(audit_logger, db):
+    good = [audit_logger.build_record(None, None, "CREATE", "TEST", details=f"good {i}") for i in range(3)]
+    bad = dict(good[0], details="bad", action=None)  # action is NOT NULL
+
+    audit_logger._insert_records([good[0], bad, good[1], good[2]])
+
+    assert _stored_details(db) == ["good 0", "good 1", "good 2"]
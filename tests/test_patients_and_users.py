@@ -0,0 +1,74 @@
+# tests/test_patients_and_users.py
+import pytest
+from sqlalchemy import select
+
+from app import crud, models, schemas
+
+
+def _patient(db, first_name, last_name=None):
+    return crud.create_patient(db, schemas.PatientCreate(first_name=first_name, last_name=last_name), created_by=None)
+
+
+def _found(db, search):
+    return sorted(p.id for p in crud.get_patients(db, search=search))
+
+
+def test_name_search_matches_the_full_name_or_any_single_word(db):
+    asha = _patient(db, "Asha Rani", "Verma")
+    ravi = _patient(db, "Ravi", "Verma")
+
+    assert _found(db, "Asha Rani Verma") == [asha.id]
+    assert _found(db, "Rani") == [asha.id]
+    assert _found(db, "Verma") == sorted([asha.id, ravi.id])
+    # Hashes have no substrings: partial words never match
+    assert _found(db, "Ran") == []
+
+
+def test_renaming_a_patient_replaces_their_name_tokens(db):
+    patient = _patient(db, "Meera", "Iyer")
+
+    crud.update_patient(db, patient.id, schemas.PatientUpdate(first_name="Meera", last_name="Nair"))
+
+    assert _found(db, "Nair") == [patient.id]
+    assert _found(db, "Iyer") == []
+    assert _found(db, "Meera") == [patient.id]
+
+
+def test_delete_patient_deactivates_with_one_update(db):
+    patient = _patient(db, "Kiran")
+
+    assert crud.delete_patient(db, patient.id) is True
+    assert crud.delete_patient(db, patient.id + 1000) is False
+    assert db.query(models.Patient.is_active).filter_by(id=patient.id).scalar() is False
+
+
+def _user(db, username):
+    user = models.User(username=username, email=f"{username}@example.com", password_hash="x", role=models.UserRole.staff)
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def test_delete_user_soft_deletes_and_hides_the_account(db):
+    _user(db, "superadmin")  # id 1 is protected
+    user_id = _user(db, "nurse")
+    assert crud.get_user_by_identifier(db, "nurse").id == user_id  # Remembered in db.info
+
+    assert crud.delete_user(db, user_id) is True
+
+    assert crud.get_user(db, user_id) is None
+    assert crud.get_user_by_identifier(db, "nurse") is None
+    deleted_at, is_active = db.execute(
+        select(models.User.deleted_at, models.User.is_active).where(models.User.id == user_id),
+        execution_options={"include_deleted": True},
+    ).one()
+    assert deleted_at is not None and is_active is False
+    # Already deleted: the UPDATE matches nothing
+    assert crud.delete_user(db, user_id) is False
+
+
+def test_superadmin_cannot_be_deleted(db):
+    _user(db, "superadmin")
+
+    with pytest.raises(crud.CRUDError):
+        crud.delete_user(db, 1)
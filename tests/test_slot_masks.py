@@ -0,0 +1,60 @@
+# tests/test_slot_masks.py
+from datetime import date, datetime, time
+
+import pytest
+
+from app import crud
+
+DAY = date(2030, 1, 7)
+
+
+def _slots(mask):
+    return [i for i in range(crud._SLOTS_PER_DAY) if mask >> i & 1]
+
+
+def test_interval_mask_is_half_open():
+    assert _slots(crud._interval_mask(36, 40)) == [36, 37, 38, 39]
+    assert crud._interval_mask(40, 40) == 0
+    assert crud._interval_mask(41, 40) == 0
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    # On the grid: 10:00-10:30 is exactly two slots
+    (datetime(2030, 1, 7, 10, 0), datetime(2030, 1, 7, 10, 30), [40, 41]),
+    # Off the grid: the start rounds down and the end rounds up
+    (datetime(2030, 1, 7, 10, 5), datetime(2030, 1, 7, 10, 35), [40, 41, 42]),
+    # A sub-minute overrun still touches the next slot
+    (datetime(2030, 1, 7, 10, 0), datetime(2030, 1, 7, 10, 30, 1), [40, 41, 42]),
+    (datetime(2030, 1, 7, 10, 0), datetime(2030, 1, 7, 10, 30, 0, 1), [40, 41, 42]),
+    # Ranges from or into neighbouring days are clamped to this one
+    (datetime(2030, 1, 6, 22, 0), datetime(2030, 1, 7, 0, 30), [0, 1]),
+    (datetime(2030, 1, 7, 23, 30), datetime(2030, 1, 8, 2, 0), [94, 95]),
+    (datetime(2030, 1, 6, 9, 0), datetime(2030, 1, 9, 9, 0), list(range(96))),
+    # Ranges that miss the day entirely
+    (datetime(2030, 1, 5, 9, 0), datetime(2030, 1, 6, 9, 0), []),
+    (datetime(2030, 1, 8, 9, 0), datetime(2030, 1, 8, 10, 0), []),
+])
+def test_day_interval_mask(start, end, expected):
+    assert _slots(crud._day_interval_mask(DAY, start, end)) == expected
+
+
+def test_schedule_slot_range_keeps_whole_slots_inside_hours():
+    on_grid = crud._ScheduleHours(time(9, 0), time(12, 0), None, None)
+    off_grid = crud._ScheduleHours(time(9, 10), time(11, 50), None, None)
+
+    assert crud._schedule_slot_range(on_grid) == (36, 48)
+    assert crud._schedule_slot_range(off_grid) == (37, 47)
+
+
+@pytest.mark.parametrize("in_break, booked, unavailable, gcal, reason", [
+    (0, 0, 0, 0, "available"),
+    (0, 0, 0, 1, "gcal_busy"),
+    (0, 0, 1, 1, "unavailable"),
+    (0, 1, 1, 1, "booked"),
+    (1, 1, 1, 1, "break"),
+    (1, 0, 0, 0, "break"),
+    (0, 1, 0, 1, "booked"),
+])
+def test_slot_reason_precedence(in_break, booked, unavailable, gcal, reason):
+    code = in_break << 3 | booked << 2 | unavailable << 1 | gcal
+    assert crud._SLOT_REASON_BY_CODE[code] == reason